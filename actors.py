@@ -0,0 +1,165 @@
+import copy
+import random
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from game_env import RobotTourEnv
+from replay import ReplayBuffer
+
+
+def run_actor(
+    actor_id: int,
+    policy,
+    policy_lock,
+    policy_version,
+    replay: ReplayBuffer,
+    stop_event,
+    env_steps,
+    seed=None,
+    observation="image",
+) -> None:
+    """
+    Rollout worker: steps its own headless RobotTourEnv with the latest policy snapshot
+
+    param actor_id: index of this actor
+    param policy: shared-memory agent that the learner publishes weights into
+    param policy_lock: lock held while the shared weights are written or copied
+    param policy_version: shared counter, bumped by the learner on every publish
+    param replay: shared ReplayBuffer that transitions are written into
+    param stop_event: event set by the learner to stop all actors
+    param env_steps: shared counter of env steps taken by all actors
+    param seed: base seed, offset by the actor id
+    param observation: observation type of the env, "image" or "features"
+    """
+
+    # Actors are single-threaded so that K of them can share the machine
+    torch.set_num_threads(1)
+    if seed is not None:
+        random.seed(seed + actor_id)
+        torch.manual_seed(seed + actor_id)
+
+    with policy_lock:
+        agent = copy.deepcopy(policy)
+        version = policy_version.value
+
+    environment = RobotTourEnv(headless=True, observation=observation)
+    state_key = environment.state_key
+
+    while not stop_event.is_set():
+        state = environment.reset()
+        done = False
+
+        while not done and not stop_event.is_set():
+            # Pick up newly published weights between steps
+            if policy_version.value != version:
+                with policy_lock:
+                    agent.load_state_dict(policy.state_dict())
+                    version = policy_version.value
+
+            state_time = torch.tensor(np.array([state["time"]]), dtype=torch.float32)
+            with torch.no_grad():
+                q_values = agent(state[state_key].unsqueeze(0), state_time.unsqueeze(0))
+            action = torch.argmax(q_values.squeeze()).item()
+
+            new_state, reward, done, _ = environment.step(action)
+            replay.add(
+                state[state_key],
+                state["time"],
+                action,
+                reward,
+                new_state[state_key],
+                new_state["time"],
+                done,
+            )
+
+            with env_steps.get_lock():
+                env_steps.value += 1
+
+            state = new_state
+
+    replay.close()
+
+    return None
+
+
+class ActorPool:
+    """
+    K rollout processes feeding a shared ReplayBuffer
+
+    The learner keeps training its own agent and calls publish on a schedule to copy
+    the weights into shared memory, where the actors pick them up.
+    """
+
+    def __init__(
+        self,
+        agent,
+        replay: ReplayBuffer,
+        num_actors: int,
+        seed=None,
+        observation="image",
+    ) -> None:
+        self.context = mp.get_context("spawn")
+        self.replay = replay
+        self.num_actors = num_actors
+
+        self.policy = copy.deepcopy(agent)
+        self.policy.share_memory()
+        self.policy_lock = self.context.Lock()
+        self.policy_version = self.context.Value("q", 0)
+        self.stop_event = self.context.Event()
+        self.env_steps = self.context.Value("q", 0)
+
+        self.processes = []
+        for actor_id in range(self.num_actors):
+            process = self.context.Process(
+                target=run_actor,
+                args=(
+                    actor_id,
+                    self.policy,
+                    self.policy_lock,
+                    self.policy_version,
+                    self.replay,
+                    self.stop_event,
+                    self.env_steps,
+                    seed,
+                    observation,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+
+        return None
+
+    def publish(self, agent) -> None:
+        # Broadcast the learner's weights to every actor
+        with self.policy_lock:
+            self.policy.load_state_dict(agent.state_dict())
+            self.policy_version.value += 1
+
+        return None
+
+    def check(self) -> None:
+        # Actors only exit once stopped, so any earlier exit means one has died
+        for actor_id, process in enumerate(self.processes):
+            if not process.is_alive():
+                raise RuntimeError(
+                    f"Actor {actor_id} exited with code {process.exitcode}"
+                )
+
+        return None
+
+    def get_env_steps(self) -> int:
+        return self.env_steps.value
+
+    def close(self, timeout=10) -> None:
+        self.stop_event.set()
+
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+        self.processes = []
+
+        return None
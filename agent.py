@@ -2,6 +2,14 @@ import torch
 import torch.nn as nn
 
 
+def bf16_supported() -> bool:
+    # bfloat16 only beats float32 on CPUs with native support (AVX512-BF16 or AMX)
+    cpu = getattr(torch, "cpu", None)
+    checks = ["_is_avx512_bf16_supported", "_is_amx_tile_supported"]
+
+    return any(getattr(cpu, check, lambda: False)() for check in checks)
+
+
 class ConvAgent(nn.Module):
     def __init__(self, image_size, time_size, output_size):
         super(ConvAgent, self).__init__()
@@ -27,6 +35,21 @@ class ConvAgent(nn.Module):
             nn.Linear(linear_input_size, 256), nn.ReLU(), nn.Linear(256, output_size)
         )
 
+        # Memory layout the convolutions run in, see set_channels_last
+        self.memory_format = torch.contiguous_format
+
+    def set_channels_last(self, enabled=True) -> None:
+        """
+        Runs the convolutions on NHWC tensors, which oneDNN handles faster on CPU
+
+        Only the memory layout changes: shapes, outputs and state dicts stay the same.
+        """
+
+        self.memory_format = torch.channels_last if enabled else torch.contiguous_format
+        self.conv_layers.to(memory_format=self.memory_format)
+
+        return None
+
     def forward(self, x_img, x_time):
         # Add a batch dimension to x_img if it's not already present
         if x_img.dim() == 3:
@@ -37,11 +60,37 @@ class ConvAgent(nn.Module):
 
         # Concatenate x_time with x_img along the channel dimension
         x_combined = torch.cat((x_img, x_time), dim=1)
+        x_combined = x_combined.contiguous(memory_format=self.memory_format)
 
         # Forward through convolutional layers
         x = self.conv_layers(x_combined)
-        x = x.view(x.size(0), -1)  # Flatten the output
+        x = torch.flatten(x, 1)  # Flatten the output, whatever its memory layout
 
         # Forward through fully connected layers
         x = self.fc_combined(x)
         return x
+
+
+class MLPAgent(nn.Module):
+    def __init__(self, feature_size, time_size, output_size, hidden_size=128):
+        super(MLPAgent, self).__init__()
+
+        # Takes the feature vector with the time appended
+        self.fc_layers = nn.Sequential(
+            nn.Linear(feature_size + time_size, hidden_size),
+            nn.ReLU(),
+            nn.Linear(hidden_size, hidden_size),
+            nn.ReLU(),
+            nn.Linear(hidden_size, output_size),
+        )
+
+    def forward(self, x_features, x_time):
+        # Add a batch dimension to x_features if it's not already present
+        if x_features.dim() == 1:
+            x_features = x_features.unsqueeze(0)
+
+        # Times arrive in milliseconds, like for ConvAgent, and are fed in seconds
+        x_time = x_time.view(x_features.size(0), -1) / 1000
+
+        x = torch.cat((x_features, x_time), dim=1)
+        return self.fc_layers(x)
@@ -0,0 +1,57 @@
+import torch
+from symmetry import SYMMETRIES, transform_action, transform_image
+
+
+def transform_batch(batch: dict, symmetry) -> dict:
+    """
+    Maps a batch of transitions onto the equivalent transitions under one symmetry
+
+    The game is symmetric under these transforms: collisions test the robot's whole
+    square footprint and bonus zones the zone under its center. Only exact ties are
+    not, such as two blockades touched at the same instant, where the one penalized
+    depends on board order.
+
+    param batch: dict of batched tensors, as returned by ReplayBuffer.sample
+    param symmetry: (turns, flip) from symmetry.SYMMETRIES
+
+    return: new batch with rotated/mirrored frames and remapped actions
+    """
+
+    transformed = dict(batch)
+    transformed["images"] = transform_image(batch["images"], symmetry)
+    transformed["next_images"] = transform_image(batch["next_images"], symmetry)
+    transformed["actions"] = transform_action(batch["actions"], symmetry)
+
+    return transformed
+
+
+def dihedral_batch(batch: dict) -> dict:
+    # Every transition under all 8 symmetries, concatenated into an 8x larger batch
+    batches = [transform_batch(batch, symmetry) for symmetry in SYMMETRIES]
+
+    return {key: torch.cat([b[key] for b in batches]) for key in batch}
+
+
+def augment_batch(batch: dict, generator=None) -> dict:
+    """
+    Applies an independently chosen random symmetry to each transition in a batch
+
+    The batch size stays the same, so each update sees the data in new orientations
+    at no extra learner cost.
+    """
+
+    choices = torch.randint(
+        len(SYMMETRIES), (len(batch["actions"]),), generator=generator
+    )
+    augmented = {key: value.clone() for key, value in batch.items()}
+
+    for index, symmetry in enumerate(SYMMETRIES):
+        mask = choices == index
+        if not mask.any():
+            continue
+
+        selected = {key: value[mask] for key, value in batch.items()}
+        for key, value in transform_batch(selected, symmetry).items():
+            augmented[key][mask] = value
+
+    return augmented
@@ -0,0 +1,391 @@
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+import numpy as np
+import torch
+
+# pygame prints a banner to stdout on import, which would break the JSON report
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from agent import ConvAgent
+from game import Game
+from game_env import RobotTourEnv
+
+# Share of the baseline latency a benchmark may slow down by before it fails
+REGRESSION_THRESHOLD = 0.1
+
+# Batch sizes of the agent benchmarks
+BATCH_SIZES = [1, 32, 128]
+
+
+def time_calls(call, iterations, prepare=None, warmup=None) -> list:
+    """
+    Times a callable, excluding any per-call preparation
+
+    param call: function of the iteration number to time
+    param iterations: number of timed calls
+    param prepare: optional function of the iteration number run before each call
+    param warmup: untimed calls made first, a tenth of the iterations by default
+
+    return: latency of each timed call in seconds
+    """
+
+    if warmup is None:
+        warmup = max(iterations // 10, 1)
+
+    latencies = []
+    for i in range(warmup + iterations):
+        if prepare is not None:
+            prepare(i)
+
+        start = time.perf_counter()
+        call(i)
+        latency = time.perf_counter() - start
+
+        if i >= warmup:
+            latencies.append(latency)
+
+    return latencies
+
+
+def summarize(latencies, items_per_call=1) -> dict:
+    latencies = np.asarray(latencies)
+
+    return {
+        "calls": len(latencies),
+        "items_per_call": items_per_call,
+        "mean_us": float(latencies.mean() * 1e6),
+        "p50_us": float(np.percentile(latencies, 50) * 1e6),
+        "p90_us": float(np.percentile(latencies, 90) * 1e6),
+        "p99_us": float(np.percentile(latencies, 99) * 1e6),
+        "throughput_per_s": float(items_per_call * len(latencies) / latencies.sum()),
+    }
+
+
+def random_poses(rng, game: Game, count) -> list:
+    # Top-left corners anywhere around the grid, with random headings
+    cell_size = game.board.get_cell_size()
+    grid_start_x, grid_start_y = game.board.get_grid_start()
+    extent = cell_size * game.board.get_grid_size()
+
+    return [
+        (
+            rng.uniform(grid_start_x - cell_size, grid_start_x + extent),
+            rng.uniform(grid_start_y - cell_size, grid_start_y + extent),
+            rng.randrange(360),
+        )
+        for _ in range(count)
+    ]
+
+
+def set_pose(game: Game, pose) -> None:
+    x, y, angle = pose
+    game.robot.set_location((x, y))
+    game.robot.set_angle(angle)
+
+    # Keep the run going however long the benchmark takes
+    game.last_movement = game.clock.get_ticks()
+    game.game_over = False
+
+    return None
+
+
+def bench_is_collision(seed, iterations):
+    rng = random.Random(seed)
+    game = Game(headless=True, seed=seed, training=True)
+    poses = random_poses(rng, game, iterations * 2)
+
+    return time_calls(lambda i: game.is_collision(*poses[i][:2]), iterations)
+
+
+def bench_swept_collision(seed, iterations):
+    # The collision test Game.move runs: a footprint swept along one step's movement
+    rng = random.Random(seed)
+    game = Game(headless=True, seed=seed, training=True)
+    board = game.board
+    grid_start_x, grid_start_y = board.get_grid_start()
+    extent = board.get_cell_size() * board.get_grid_size()
+    size = game.robot.get_size()
+
+    moves = []
+    for x, y, angle in random_poses(rng, game, iterations * 2):
+        distance = rng.uniform(1, 10)
+        on_grid = (
+            grid_start_x <= x <= grid_start_x + extent - size
+            and grid_start_y <= y <= grid_start_y + extent - size
+        )
+        moves.append(
+            (
+                x,
+                y,
+                distance * math.cos(math.radians(angle)),
+                distance * math.sin(math.radians(angle)),
+                size,
+                on_grid,
+            )
+        )
+
+    return time_calls(lambda i: board.get_swept_collision(*moves[i]), iterations)
+
+
+def bench_move_forward(seed, iterations):
+    rng = random.Random(seed)
+    game = Game(headless=True, seed=seed, training=True)
+    poses = random_poses(rng, game, iterations * 2)
+
+    return time_calls(
+        lambda i: game.move_forward(),
+        iterations,
+        prepare=lambda i: set_pose(game, poses[i]),
+    )
+
+
+def bench_check_bonus_zones(seed, iterations):
+    rng = random.Random(seed)
+    game = Game(headless=True, seed=seed, training=True)
+    poses = random_poses(rng, game, iterations * 2)
+
+    def prepare(i):
+        set_pose(game, poses[i])
+
+        # Unclaim the bonus zones so every call can score one
+        for zone in game.board.get_bonus_zones():
+            game.board.get_bonus_zones()[zone] = False
+
+    return time_calls(lambda i: game.judge.check_bonus_zones(), iterations, prepare)
+
+
+def bench_render(seed, iterations):
+    # Human-mode frames, drawn offscreen when there is no display
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    rng = random.Random(seed)
+    game = Game(headless=False, seed=seed, simulated=True, training=True)
+    poses = random_poses(rng, game, iterations * 2)
+
+    return time_calls(
+        lambda i: game.render(), iterations, lambda i: set_pose(game, poses[i])
+    )
+
+
+def bench_preprocess_image(seed, iterations):
+    rng = random.Random(seed)
+    game = Game(headless=True, seed=seed, training=True)
+    poses = random_poses(rng, game, iterations * 2)
+
+    def prepare(i):
+        set_pose(game, poses[i])
+        game.draw()
+
+    return time_calls(
+        lambda i: Game.preprocess_image(game.surface), iterations, prepare
+    )
+
+
+def bench_get_state(seed, iterations):
+    rng = random.Random(seed)
+    game = Game(headless=True, seed=seed, training=True)
+    poses = random_poses(rng, game, iterations * 2)
+
+    return time_calls(
+        lambda i: game.get_state(), iterations, lambda i: set_pose(game, poses[i])
+    )
+
+
+def bench_env_step(seed, iterations):
+    rng = random.Random(seed)
+    environment = RobotTourEnv(headless=True)
+    environment.reset(seed=seed)
+
+    # Primitive actions other than ending the run, restarting when a run times out
+    actions = [rng.randrange(6) for _ in range(iterations * 2)]
+
+    def prepare(i):
+        if environment.game.is_over():
+            environment.reset(seed=seed + i)
+
+    return time_calls(lambda i: environment.step(actions[i]), iterations, prepare)
+
+
+def bench_env_reset(seed, iterations):
+    environment = RobotTourEnv(headless=True)
+
+    return time_calls(lambda i: environment.reset(seed=seed + i), iterations)
+
+
+def bench_agent_forward(seed, iterations, batch_size):
+    torch.manual_seed(seed)
+    agent = ConvAgent((3, 64, 64), 1, 7)
+    images = torch.rand(batch_size, 3, 64, 64) * 2 - 1
+    times = torch.rand(batch_size, 1)
+
+    def call(i):
+        with torch.no_grad():
+            agent(images, times)
+
+    return time_calls(call, iterations)
+
+
+def bench_agent_backward(seed, iterations, batch_size):
+    torch.manual_seed(seed)
+    agent = ConvAgent((3, 64, 64), 1, 7)
+    images = torch.rand(batch_size, 3, 64, 64) * 2 - 1
+    times = torch.rand(batch_size, 1)
+    targets = torch.rand(batch_size, 7)
+
+    def call(i):
+        agent.zero_grad()
+        loss = torch.nn.functional.mse_loss(agent(images, times), targets)
+        loss.backward()
+
+    return time_calls(call, iterations)
+
+
+def get_benchmarks() -> dict:
+    # Name -> (function of seed and iterations, default iterations, items per call)
+    benchmarks = {
+        "game.is_collision": (bench_is_collision, 20000, 1),
+        "board.get_swept_collision": (bench_swept_collision, 20000, 1),
+        "game.move_forward": (bench_move_forward, 20000, 1),
+        "judge.check_bonus_zones": (bench_check_bonus_zones, 20000, 1),
+        "game.render": (bench_render, 2000, 1),
+        "game.preprocess_image": (bench_preprocess_image, 200, 1),
+        "game.get_state": (bench_get_state, 2000, 1),
+        "env.step": (bench_env_step, 2000, 1),
+        "env.reset": (bench_env_reset, 500, 1),
+    }
+
+    for batch_size in BATCH_SIZES:
+        benchmarks[f"agent.forward.b{batch_size}"] = (
+            lambda seed, iterations, b=batch_size: bench_agent_forward(
+                seed, iterations, b
+            ),
+            max(2000 // batch_size, 20),
+            batch_size,
+        )
+        benchmarks[f"agent.backward.b{batch_size}"] = (
+            lambda seed, iterations, b=batch_size: bench_agent_backward(
+                seed, iterations, b
+            ),
+            max(1000 // batch_size, 10),
+            batch_size,
+        )
+
+    return benchmarks
+
+
+def run_benchmarks(seed=0, scale=1.0, only=None, verbose=True) -> dict:
+    """
+    Runs the benchmark suite
+
+    param seed: seed of every scenario, so runs see the same boards and inputs
+    param scale: multiplier on each benchmark's number of iterations
+    param only: optional substrings, a benchmark only runs if its name contains one
+    param verbose: whether to print each result as it finishes
+
+    return: JSON-serializable report with the environment and per-benchmark stats
+    """
+
+    report = {
+        "meta": {
+            "seed": seed,
+            "scale": scale,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "torch": torch.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "torch_threads": torch.get_num_threads(),
+        },
+        "results": {},
+    }
+
+    for name, (function, iterations, items_per_call) in get_benchmarks().items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+
+        latencies = function(seed, max(int(iterations * scale), 1))
+        result = summarize(latencies, items_per_call)
+        report["results"][name] = result
+
+        # Progress goes to stderr, so the report printed to stdout stays valid JSON
+        if verbose:
+            print(
+                f"{name:28s} p50 {result['p50_us']:10.1f} us  "
+                f"p90 {result['p90_us']:10.1f} us  p99 {result['p99_us']:10.1f} us  "
+                f"{result['throughput_per_s']:12.1f} /s",
+                file=sys.stderr,
+            )
+
+    return report
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD) -> list:
+    """
+    Finds benchmarks whose median latency regressed against a baseline report
+
+    param report: report from run_benchmarks
+    param baseline: earlier report to compare against
+    param threshold: allowed slowdown, as a share of the baseline median
+
+    return: (name, baseline p50, current p50, relative change) for each regression
+    """
+
+    regressions = []
+    for name, result in report["results"].items():
+        if name not in baseline["results"]:
+            continue
+
+        before = baseline["results"][name]["p50_us"]
+        after = result["p50_us"]
+        change = (after - before) / before
+        if change > threshold:
+            regressions.append((name, before, after, change))
+
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="multiplier on iteration counts"
+    )
+    parser.add_argument(
+        "--only", nargs="*", help="run only benchmarks whose name contains one of these"
+    )
+    parser.add_argument("--output", help="file to write the JSON report to")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=REGRESSION_THRESHOLD,
+        help="allowed median slowdown against the baseline, e.g. 0.1 for 10%%",
+    )
+    args = parser.parse_args()
+
+    report = run_benchmarks(seed=args.seed, scale=args.scale, only=args.only)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = compare(report, baseline, args.threshold)
+        for name, before, after, change in regressions:
+            print(
+                f"Regression in {name}: p50 {before:.1f} us -> {after:.1f} us (+{change:.0%})",
+                file=sys.stderr,
+            )
+
+        if regressions:
+            sys.exit(1)
@@ -1,7 +1,105 @@
 from collections import defaultdict
+import math
 import pygame
 import random
 
+# Colors used when drawing the board
+GRID_COLOR = (0, 0, 255)
+BONUS_COLOR = (53, 94, 59)
+BONUS_HIT_COLOR = (50, 180, 65)
+BLOCKADE_COLOR = (202, 164, 114)
+BLOCKADE_HIT_COLOR = (255, 0, 0)
+
+# Every possible blockade, in bit order for Board.encode
+BLOCKADE_LOCATIONS = [(k, "N") for k in range(5, 17)]
+BLOCKADE_LOCATIONS += [(k, "E") for k in range(1, 17) if k % 4 != 0]
+BLOCKADE_LOCATIONS += [(k, "S") for k in range(1, 13)]
+BLOCKADE_LOCATIONS += [(k, "W") for k in range(1, 17) if k % 4 != 1]
+
+STARTING_ZONES = [1, 2, 3, 4, 5, 8, 9, 12, 13, 14, 15, 16]
+STARTING_SIDES = [None, "top", "side"]
+
+# Bit offsets of each field in a board code
+BLOCKADE_SHIFT = 0
+BLOCKADE_HIT_SHIFT = 48
+BONUS_SHIFT = 96
+BONUS_HIT_SHIFT = 112
+STARTING_ZONE_SHIFT = 128
+STARTING_SIDE_SHIFT = 132
+TARGET_ZONE_SHIFT = 134
+
+
+def pack_code(
+    blockades,
+    blockade_hits,
+    bonus_zones,
+    bonus_hits,
+    starting_zone,
+    starting_side,
+    target_zone,
+) -> int:
+    """
+    Packs a board layout into a single integer
+
+    param blockades: 48-bit mask over BLOCKADE_LOCATIONS
+    param blockade_hits: 48-bit mask of blockades that have been hit
+    param bonus_zones: 16-bit mask of bonus zones (bit 0 is zone 1)
+    param bonus_hits: 16-bit mask of bonus zones that have been claimed
+    param starting_zone: starting zone number
+    param starting_side: index into STARTING_SIDES
+    param target_zone: target zone number
+
+    return: board code
+    """
+
+    return (
+        (blockades << BLOCKADE_SHIFT)
+        | (blockade_hits << BLOCKADE_HIT_SHIFT)
+        | (bonus_zones << BONUS_SHIFT)
+        | (bonus_hits << BONUS_HIT_SHIFT)
+        | ((starting_zone - 1) << STARTING_ZONE_SHIFT)
+        | (starting_side << STARTING_SIDE_SHIFT)
+        | ((target_zone - 1) << TARGET_ZONE_SHIFT)
+    )
+
+
+def slab_interval(start, delta, low, high):
+    # Times t at which start + t * delta lies strictly between low and high
+    if delta == 0:
+        if low < start < high:
+            return -math.inf, math.inf
+
+        return math.inf, -math.inf
+
+    t_low = (low - start) / delta
+    t_high = (high - start) / delta
+
+    return min(t_low, t_high), max(t_low, t_high)
+
+
+def slab_exit(start, delta, low, high):
+    # Time at which start + t * delta leaves [low, high], or 0 if it is already leaving
+    if delta > 0:
+        return max((high - start) / delta, 0)
+
+    if delta < 0:
+        return max((low - start) / delta, 0)
+
+    return math.inf
+
+
+def unpack_code(code: int) -> tuple:
+    # Inverse of pack_code
+    return (
+        (code >> BLOCKADE_SHIFT) & (2**48 - 1),
+        (code >> BLOCKADE_HIT_SHIFT) & (2**48 - 1),
+        (code >> BONUS_SHIFT) & (2**16 - 1),
+        (code >> BONUS_HIT_SHIFT) & (2**16 - 1),
+        ((code >> STARTING_ZONE_SHIFT) & 15) + 1,
+        (code >> STARTING_SIDE_SHIFT) & 3,
+        ((code >> TARGET_ZONE_SHIFT) & 15) + 1,
+    )
+
 
 class Board:
     def __init__(
@@ -12,6 +110,8 @@ class Board:
         blockades={},
         grid_size=4,
         cell_size=100,
+        seed=None,
+        code=None,
     ) -> None:
         # Set up grid dimensions and spacing
         self.window = window
@@ -27,18 +127,38 @@ class Board:
             self.surface.get_height() - self.grid_size * self.cell_size
         ) // 2
 
-        self.set_starting_zone()
-        self.set_starting_point()
-        self.set_target_zone()
-        self.set_target_point()
-        self.set_bonus_zones()
+        # Bumped whenever anything drawn on the board changes, so renderers know
+        # when a cached picture of the board is stale
+        self.version = 0
 
-        # Set blockades
-        if len(blockades) > 0:
-            self.blockades = blockades
-        self.set_blockades()
+        self.reset(seed=seed, code=code, blockades=blockades)
 
-        self.draw_grid()
+        # Headless boards (no window) are only drawn when a frame is requested
+        if self.window is not None:
+            self.draw_grid()
+
+    def reset(self, seed=None, code=None, blockades={}) -> None:
+        # Layouts come from a private generator when seeded, so they are reproducible
+        self.rng = random.Random(seed) if seed is not None else random
+
+        # Rebuild an encoded layout, or generate a new one
+        if code is not None:
+            self.decode(code)
+        else:
+            self.set_starting_zone()
+            self.set_starting_point()
+            self.set_target_zone()
+            self.set_target_point()
+            self.set_bonus_zones()
+
+            # Set blockades
+            if len(blockades) > 0:
+                self.blockades = blockades
+            self.set_blockades()
+
+        self.version += 1
+
+        return None
 
     def get_grid_start(self):
         return self.grid_start_x, self.grid_start_y
@@ -49,6 +169,15 @@ class Board:
     def get_grid_size(self):
         return self.grid_size
 
+    def get_zone(self, point):
+        # Zone number containing a point, or None if the point is off the grid
+        col = int((point[0] - self.grid_start_x) // self.cell_size)
+        row = int((point[1] - self.grid_start_y) // self.cell_size)
+        if not (0 <= col < self.grid_size and 0 <= row < self.grid_size):
+            return None
+
+        return row * self.grid_size + col + 1
+
     def get_target_point(self):
         return self.target_point
 
@@ -57,12 +186,18 @@ class Board:
 
     def hit_blockade(self, location):
         self.blockades[location] = True
+        self.version += 1
 
     def get_blockade_size(self):
         return self.blockade_size
 
     def set_starting_zone(self):
-        self.starting_zone = random.choice([1, 2, 3, 4, 5, 8, 9, 12, 13, 14, 15, 16])
+        self.starting_zone = self.rng.choice(STARTING_ZONES)
+
+        # Corner zones can be entered from the top/bottom or from the side
+        self.starting_side = None
+        if self.starting_zone in [1, 4, 13, 16]:
+            self.starting_side = self.rng.choice(["top", "side"])
 
     def get_starting_zone(self):
         return self.starting_zone
@@ -71,12 +206,7 @@ class Board:
         return self.starting_point
 
     def get_starting_edge(self):
-        starting_zone = self.starting_zone
-        starting_side = None
-        if starting_zone in [1, 4, 13, 16]:
-            starting_side = random.choice(["top", "side"])
-
-        return starting_zone, starting_side
+        return self.starting_zone, self.starting_side
 
     def set_starting_point(self) -> None:
         starting_zone, starting_side = self.get_starting_edge()
@@ -151,7 +281,7 @@ class Board:
     def set_target_zone(self):
         self.target_zone = self.starting_zone
         while self.target_zone == self.starting_zone:
-            self.target_zone = random.randint(1, 16)
+            self.target_zone = self.rng.randint(1, 16)
 
     def set_target_point(self):
         target_point = (
@@ -170,24 +300,21 @@ class Board:
             self.bonus_zones = {k: False for k in bonus_zones}
         else:
             self.bonus_zones = {
-                k: False for k in random.sample(range(1, 17), random.randint(1, 4))
+                k: False for k in self.rng.sample(range(1, 17), self.rng.randint(1, 4))
             }
 
         return None
 
     def set_blockades(self) -> None:
         self.blockades = {}
-        possible_blockades = [(k, "N") for k in range(5, 17)]
-        possible_blockades += [(k, "E") for k in range(1, 17) if k % 4 != 0]
-        possible_blockades += [(k, "S") for k in range(1, 13)]
-        possible_blockades += [(k, "W") for k in range(1, 17) if k % 4 != 1]
+        possible_blockades = BLOCKADE_LOCATIONS
 
-        num_blockades = random.randint(1, 8)
+        num_blockades = self.rng.randint(1, 8)
         num_chosen = 0
         num_zone_blockades = defaultdict(int)
 
         while num_chosen < num_blockades:
-            blockade = random.choice(possible_blockades)
+            blockade = self.rng.choice(possible_blockades)
 
             if blockade not in self.blockades.keys():
                 if self.starting_zone == blockade[0]:
@@ -201,23 +328,93 @@ class Board:
                         num_zone_blockades[blockade[0]] += 1
                         num_chosen += 1
 
+        # The collision map depends on the layout, so rebuild it on the next lookup
+        self.collision_map_size = None
+
+        return None
+
+    def encode(self) -> int:
+        """
+        Encodes the layout and its hit flags as a single integer (see pack_code)
+
+        return: board code, which rebuilds this board via Board(window, surface, code=...)
+        """
+
+        blockades = blockade_hits = 0
+        for location, hit in self.blockades.items():
+            bit = 1 << BLOCKADE_LOCATIONS.index(location)
+            blockades |= bit
+            if hit:
+                blockade_hits |= bit
+
+        bonus_zones = bonus_hits = 0
+        for zone_number, hit in self.bonus_zones.items():
+            bit = 1 << (zone_number - 1)
+            bonus_zones |= bit
+            if hit:
+                bonus_hits |= bit
+
+        return pack_code(
+            blockades,
+            blockade_hits,
+            bonus_zones,
+            bonus_hits,
+            self.starting_zone,
+            STARTING_SIDES.index(self.starting_side),
+            self.target_zone,
+        )
+
+    def decode(self, code: int) -> None:
+        (
+            blockades,
+            blockade_hits,
+            bonus_zones,
+            bonus_hits,
+            starting_zone,
+            starting_side,
+            target_zone,
+        ) = unpack_code(code)
+
+        self.starting_zone = starting_zone
+        self.starting_side = STARTING_SIDES[starting_side]
+        self.set_starting_point()
+        self.target_zone = target_zone
+        self.set_target_point()
+
+        self.bonus_zones = {
+            k: bool(bonus_hits >> (k - 1) & 1)
+            for k in range(1, 17)
+            if bonus_zones >> (k - 1) & 1
+        }
+        self.blockades = {
+            location: bool(blockade_hits >> i & 1)
+            for i, location in enumerate(BLOCKADE_LOCATIONS)
+            if blockades >> i & 1
+        }
+        self.collision_map_size = None
+
         return None
 
     def hit_bonus_zone(self, zone_number):
         self.bonus_zones[zone_number] = True
+        self.version += 1
+
+    def get_version(self) -> int:
+        return self.version
 
     def get_bonus_zones(self):
         return self.bonus_zones
 
-    def draw_grid(self, font_size=18, color=(0, 0, 0)):
+    def draw_grid(self, font_size=18, color=(0, 0, 0), surface=None):
+        surface = self.surface if surface is None else surface
         bonus_zones = self.get_bonus_zones()
         for row in range(self.grid_size):
             for col in range(self.grid_size):
                 x = col * self.cell_size + self.grid_start_x
                 y = row * self.cell_size + self.grid_start_y
                 pygame.draw.rect(
-                    self.surface,
-                    (0, 0, 255),
+                    surface,
+                    GRID_COLOR,
                     (x, y, self.cell_size, self.cell_size),
                     1,
                 )
@@ -233,74 +430,251 @@ class Board:
                 if zone_number in bonus_zones:
                     if bonus_zones[zone_number]:
                         pygame.draw.rect(
-                            self.surface,
-                            (50, 180, 65),
+                            surface,
+                            BONUS_HIT_COLOR,
                             (x + 1, y + 1, self.cell_size - 1, self.cell_size - 1),
                         )
                     else:
                         pygame.draw.rect(
-                            self.surface,
-                            (53, 94, 59),
+                            surface,
+                            BONUS_COLOR,
                             (x + 1, y + 1, self.cell_size - 1, self.cell_size - 1),
                         )
 
         return None
 
-    # Function to draw blockades
-    def draw_blockades(self):
+    def get_blockade_segment(self, location):
+        x = (location[0] - 1) % self.grid_size
+        y = (location[0] - 1) // self.grid_size
+
+        if location[1] == "N":
+            start_point = (
+                x * self.cell_size + self.grid_start_x,
+                y * self.cell_size + self.grid_start_y,
+            )
+            end_point = (
+                (x + 1) * self.cell_size + self.grid_start_x,
+                y * self.cell_size + self.grid_start_y,
+            )
+        elif location[1] == "E":
+            start_point = (
+                (x + 1) * self.cell_size + self.grid_start_x,
+                y * self.cell_size + self.grid_start_y,
+            )
+            end_point = (
+                (x + 1) * self.cell_size + self.grid_start_x,
+                (y + 1) * self.cell_size + self.grid_start_y,
+            )
+        elif location[1] == "S":
+            start_point = (
+                (x + 1) * self.cell_size + self.grid_start_x,
+                (y + 1) * self.cell_size + self.grid_start_y,
+            )
+            end_point = (
+                x * self.cell_size + self.grid_start_x,
+                (y + 1) * self.cell_size + self.grid_start_y,
+            )
+        elif location[1] == "W":
+            start_point = (
+                x * self.cell_size + self.grid_start_x,
+                (y + 1) * self.cell_size + self.grid_start_y,
+            )
+            end_point = (
+                x * self.cell_size + self.grid_start_x,
+                y * self.cell_size + self.grid_start_y,
+            )
+
+        return start_point, end_point
+
+    def build_collision_map(self, robot_size) -> None:
+        """
+        Precomputes the blockades a robot footprint can touch from each region of the board
+
+        Positions are bucketed into cell-sized squares of the robot's top-left corner, and
+        each bucket lists the blockades (in board order) whose collision area overlaps it.
+
+        param robot_size: width and height of the robot footprint
+        """
+
+        blockade_size = self.blockade_size
+        self.collision_segments = []
+        self.collision_cells = defaultdict(list)
+
         for location in self.blockades.keys():
-            x = (location[0] - 1) % self.grid_size
-            y = (location[0] - 1) // self.grid_size
+            start_point, end_point = self.get_blockade_segment(location)
+            x_start, x_end = sorted((start_point[0], end_point[0]))
+            y_start, y_end = sorted((start_point[1], end_point[1]))
+            self.collision_segments.append((location, x_start, x_end, y_start, y_end))
+
+            # Range of top-left corners that would touch this blockade
+            min_x = x_start - robot_size - blockade_size
+            max_x = x_end + blockade_size
+            min_y = y_start - robot_size - blockade_size
+            max_y = y_end + blockade_size
+
+            for cell_x in range(
+                int((min_x - self.grid_start_x) // self.cell_size),
+                int((max_x - self.grid_start_x) // self.cell_size) + 1,
+            ):
+                for cell_y in range(
+                    int((min_y - self.grid_start_y) // self.cell_size),
+                    int((max_y - self.grid_start_y) // self.cell_size) + 1,
+                ):
+                    self.collision_cells[(cell_x, cell_y)].append(
+                        len(self.collision_segments) - 1
+                    )
+
+        # Robot size the map was built for, so lookups know when to rebuild it
+        self.collision_map_size = robot_size
 
-            if location[1] == "N":
-                start_point = (
-                    x * self.cell_size + self.grid_start_x,
-                    y * self.cell_size + self.grid_start_y,
-                )
-                end_point = (
-                    (x + 1) * self.cell_size + self.grid_start_x,
-                    y * self.cell_size + self.grid_start_y,
-                )
-            elif location[1] == "E":
-                start_point = (
-                    (x + 1) * self.cell_size + self.grid_start_x,
-                    y * self.cell_size + self.grid_start_y,
-                )
-                end_point = (
-                    (x + 1) * self.cell_size + self.grid_start_x,
-                    (y + 1) * self.cell_size + self.grid_start_y,
-                )
-            elif location[1] == "S":
-                start_point = (
-                    (x + 1) * self.cell_size + self.grid_start_x,
-                    (y + 1) * self.cell_size + self.grid_start_y,
-                )
-                end_point = (
-                    x * self.cell_size + self.grid_start_x,
-                    (y + 1) * self.cell_size + self.grid_start_y,
-                )
-            elif location[1] == "W":
-                start_point = (
-                    x * self.cell_size + self.grid_start_x,
-                    (y + 1) * self.cell_size + self.grid_start_y,
-                )
-                end_point = (
-                    x * self.cell_size + self.grid_start_x,
-                    y * self.cell_size + self.grid_start_y,
-                )
+        return None
+
+    def get_collision(self, x, y, robot_size, entered_grid=True):
+        """
+        Looks up what a robot footprint with its top-left corner at (x, y) would touch
+
+        param x: x-coordinate of the robot
+        param y: y-coordinate of the robot
+        param robot_size: width and height of the robot footprint
+        param entered_grid: whether the robot is confined to the grid
+
+        return: blockade location, "border" if outside the grid, or None if free
+        """
+
+        if self.collision_map_size != robot_size:
+            self.build_collision_map(robot_size)
+
+        blockade_size = self.blockade_size
+        cell = (
+            int((x - self.grid_start_x) // self.cell_size),
+            int((y - self.grid_start_y) // self.cell_size),
+        )
+        for index in self.collision_cells.get(cell, ()):
+            location, x_start, x_end, y_start, y_end = self.collision_segments[index]
+            if (
+                ((x_start - (x + robot_size)) < blockade_size)
+                and ((x - x_end) < blockade_size)
+                and ((y_start - (y + robot_size)) < blockade_size)
+                and ((y - y_end) < blockade_size)
+            ):
+                return location
+
+        grid_end_x = self.grid_start_x + self.cell_size * self.grid_size
+        grid_end_y = self.grid_start_y + self.cell_size * self.grid_size
+        if entered_grid and (
+            (x <= self.grid_start_x)
+            or (y <= self.grid_start_y)
+            or ((x + robot_size) >= grid_end_x)
+            or ((y + robot_size) >= grid_end_y)
+        ):
+            return "border"
+
+        return None
+
+    def get_swept_collision(self, x, y, dx, dy, robot_size, entered_grid=True):
+        """
+        Finds the first thing a robot footprint touches while moving by (dx, dy)
+
+        Each blockade is a rectangle of top-left corners that would touch it, so the
+        move is tested against those rectangles along its whole length and fast robots
+        cannot pass through a blockade between two positions. A robot that already
+        touches a blockade is only stopped by it if the move ends touching it too.
+        Once on the grid, the robot is stopped where it would leave the grid.
+
+        param x: x-coordinate of the robot
+        param y: y-coordinate of the robot
+        param dx: movement along x
+        param dy: movement along y
+        param robot_size: width and height of the robot footprint
+        param entered_grid: whether the robot is confined to the grid
+
+        return: blockade location, "border" or None for the first contact; the fraction
+            of the move made before the contact (1 if there is none); and whether the
+            robot is on the grid after the move
+        """
+
+        if self.collision_map_size != robot_size:
+            self.build_collision_map(robot_size)
+
+        blockade_size = self.blockade_size
+        collision = None
+        contact = 1
+
+        # Blockades listed in every bucket the move passes over, in board order
+        indices = set()
+        for cell_x in range(
+            int((min(x, x + dx) - self.grid_start_x) // self.cell_size),
+            int((max(x, x + dx) - self.grid_start_x) // self.cell_size) + 1,
+        ):
+            for cell_y in range(
+                int((min(y, y + dy) - self.grid_start_y) // self.cell_size),
+                int((max(y, y + dy) - self.grid_start_y) // self.cell_size) + 1,
+            ):
+                indices.update(self.collision_cells.get((cell_x, cell_y), ()))
+
+        for index in sorted(indices):
+            location, x_start, x_end, y_start, y_end = self.collision_segments[index]
+            x_enter, x_exit = slab_interval(
+                x, dx, x_start - robot_size - blockade_size, x_end + blockade_size
+            )
+            y_enter, y_exit = slab_interval(
+                y, dy, y_start - robot_size - blockade_size, y_end + blockade_size
+            )
+            enter = max(x_enter, y_enter)
+            exit = min(x_exit, y_exit)
+            if enter >= exit or exit <= 0:
+                continue
+
+            if enter < 0:
+                # Already touching, so only blocked if the move does not get clear
+                if exit <= 1:
+                    continue
+                enter = 0
+
+            if enter < contact:
+                collision = location
+                contact = enter
+
+        # Range of top-left corners that keep the robot on the grid
+        low_x = self.grid_start_x
+        low_y = self.grid_start_y
+        high_x = self.grid_start_x + self.cell_size * self.grid_size - robot_size
+        high_y = self.grid_start_y + self.cell_size * self.grid_size - robot_size
+
+        # The robot enters the grid once it is strictly inside it before any contact
+        if not entered_grid:
+            x_enter, x_exit = slab_interval(x, dx, low_x, high_x)
+            y_enter, y_exit = slab_interval(y, dy, low_y, high_y)
+            enter = max(x_enter, y_enter)
+            exit = min(x_exit, y_exit)
+            entered_grid = enter < exit and enter < contact and exit > 0
+
+        if entered_grid:
+            border = min(
+                slab_exit(x, dx, low_x, high_x), slab_exit(y, dy, low_y, high_y)
+            )
+            if border < contact:
+                collision = "border"
+                contact = border
+
+        return collision, contact, entered_grid
+
+    # Function to draw blockades
+    def draw_blockades(self, surface=None):
+        surface = self.surface if surface is None else surface
+        for location in self.blockades.keys():
+            start_point, end_point = self.get_blockade_segment(location)
 
             if self.blockades[location]:
-                pygame.draw.line(self.surface, (255, 0, 0), start_point, end_point, 5)
+                pygame.draw.line(surface, BLOCKADE_HIT_COLOR, start_point, end_point, 5)
             else:
-                pygame.draw.line(
-                    self.surface, (202, 164, 114), start_point, end_point, 5
-                )
+                pygame.draw.line(surface, BLOCKADE_COLOR, start_point, end_point, 5)
 
         return None
 
-    def draw(self) -> None:
+    def draw(self, surface=None) -> None:
         # Draw the grid and blockades directly onto the render_surface
-        self.draw_grid()
-        self.draw_blockades()
+        self.draw_grid(surface=surface)
+        self.draw_blockades(surface=surface)
 
         return None
@@ -0,0 +1,246 @@
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import json
+import os
+import random
+import numpy as np
+import torch
+
+INDEX_FILENAME = "checkpoints.json"
+
+
+def get_rng_state() -> dict:
+    return {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+    }
+
+
+def set_rng_state(state: dict) -> None:
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+
+    return None
+
+
+def snapshot(value):
+    # Copies tensors and arrays so training can keep changing them while a save runs
+    if isinstance(value, torch.Tensor):
+        return value.detach().to("cpu", copy=True)
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    if isinstance(value, dict):
+        return {key: snapshot(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(snapshot(item) for item in value)
+
+    return copy.deepcopy(value)
+
+
+def atomic_write(path, write) -> None:
+    """
+    Writes a file so that it is either complete or absent, even if the process dies
+
+    param path: destination path
+    param write: function of an open binary file that writes the contents
+    """
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_path, path)
+
+    return None
+
+
+def load_checkpoint(path) -> dict:
+    # Checkpoints hold RNG states and numpy arrays, so they are not weights-only
+    return torch.load(path, map_location="cpu", weights_only=False)
+
+
+class CheckpointWriter:
+    """
+    Writes training checkpoints from a background thread and prunes old ones
+
+    save snapshots the state in the calling thread, which only copies tensors and
+    arrays in memory, and the slow part (serializing and writing to disk) happens in
+    a worker thread. Each file is written atomically. After every write, only the
+    keep_last most recent checkpoints and the keep_best highest-scoring ones are kept
+    on disk. The list of checkpoints is stored in checkpoints.json next to them, so
+    a resumed run carries on with the same retention. A fresh run refuses a directory
+    that already holds checkpoints, so runs never overwrite or prune each other's.
+    """
+
+    def __init__(
+        self,
+        directory,
+        keep_last=3,
+        keep_best=2,
+        max_pending=1,
+        prefix="checkpoint",
+        resume=False,
+    ) -> None:
+        """
+        param directory: directory the checkpoints are written to
+        param keep_last: number of most recent checkpoints to keep
+        param keep_best: number of highest-scoring checkpoints to keep
+        param max_pending: saves that can be queued before save blocks, which bounds
+            the memory held by snapshots
+        param prefix: start of the checkpoint filenames
+        param resume: whether this run continues the checkpoints already in directory
+        """
+
+        self.directory = directory
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        self.max_pending = max_pending
+        self.prefix = prefix
+
+        os.makedirs(self.directory, exist_ok=True)
+        if resume:
+            self.checkpoints = self.load_index()
+        else:
+            existing = [
+                filename
+                for filename in os.listdir(self.directory)
+                if filename == INDEX_FILENAME or filename.startswith(f"{prefix}_")
+            ]
+            if existing:
+                raise ValueError(
+                    f"{self.directory} already holds checkpoints of another run; "
+                    "resume from them or use another directory"
+                )
+            self.checkpoints = []
+
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = []
+
+        return None
+
+    def get_index_path(self) -> str:
+        return os.path.join(self.directory, INDEX_FILENAME)
+
+    def load_index(self) -> list:
+        if not os.path.exists(self.get_index_path()):
+            return []
+
+        with open(self.get_index_path()) as f:
+            return json.load(f)
+
+    def get_latest(self):
+        # Path of the most recent checkpoint written so far, or None if there is none
+        self.wait()
+        if not self.checkpoints:
+            return None
+
+        latest = max(self.checkpoints, key=lambda entry: entry["step"])
+
+        return os.path.join(self.directory, latest["filename"])
+
+    def discard_after(self, step) -> None:
+        """
+        Drops checkpoints taken after step, when resuming from an earlier one
+
+        They belong to the run being replaced, and would otherwise be overwritten by
+        and ranked against the resumed run's checkpoints.
+        """
+
+        self.wait()
+        self.prune(
+            {entry["filename"] for entry in self.checkpoints if entry["step"] <= step}
+        )
+
+        return None
+
+    def save(self, state: dict, step: int, score=None) -> str:
+        """
+        Queues a checkpoint to be written in the background
+
+        param state: dict of state dicts, counters and other picklable values
+        param step: training progress the checkpoint is taken at, e.g. the episode
+        param score: value ranking the checkpoint for keep_best, higher is better
+
+        return: path the checkpoint will be written to
+        """
+
+        # Surface errors from earlier writes and bound the number of queued snapshots
+        pending = []
+        for future in self.pending:
+            if future.done():
+                future.result()
+            else:
+                pending.append(future)
+        self.pending = pending
+
+        while len(self.pending) >= self.max_pending:
+            self.pending.pop(0).result()
+
+        filename = f"{self.prefix}_{step}.pth"
+        self.pending.append(
+            self.executor.submit(self.write, filename, snapshot(state), step, score)
+        )
+
+        return os.path.join(self.directory, filename)
+
+    def write(self, filename, state, step, score) -> None:
+        # Runs in the worker thread, which also owns self.checkpoints
+        path = os.path.join(self.directory, filename)
+        atomic_write(path, lambda f: torch.save(state, f))
+
+        self.checkpoints = [
+            entry for entry in self.checkpoints if entry["filename"] != filename
+        ]
+        self.checkpoints.append({"filename": filename, "step": step, "score": score})
+        self.apply_retention()
+
+        return None
+
+    def apply_retention(self) -> None:
+        latest = sorted(self.checkpoints, key=lambda entry: entry["step"])
+        scored = [entry for entry in self.checkpoints if entry["score"] is not None]
+        best = sorted(scored, key=lambda entry: entry["score"])
+
+        kept = latest[-self.keep_last :] if self.keep_last > 0 else []
+        kept += best[-self.keep_best :] if self.keep_best > 0 else []
+        self.prune({entry["filename"] for entry in kept})
+
+        return None
+
+    def prune(self, kept_filenames) -> None:
+        # Update the index before deleting, so it never lists a missing file
+        removed = [
+            entry
+            for entry in self.checkpoints
+            if entry["filename"] not in kept_filenames
+        ]
+        self.checkpoints = [
+            entry for entry in self.checkpoints if entry["filename"] in kept_filenames
+        ]
+        atomic_write(
+            self.get_index_path(),
+            lambda f: f.write(json.dumps(self.checkpoints, indent=2).encode()),
+        )
+
+        for entry in removed:
+            path = os.path.join(self.directory, entry["filename"])
+            if os.path.exists(path):
+                os.remove(path)
+
+        return None
+
+    def wait(self) -> None:
+        # Block until every queued checkpoint is on disk
+        while self.pending:
+            self.pending.pop(0).result()
+
+        return None
+
+    def close(self) -> None:
+        self.wait()
+        self.executor.shutdown()
+
+        return None
@@ -0,0 +1,62 @@
+import pygame
+
+FRAME_RATE = 60
+
+# Milliseconds a simulated step advances, one frame at the display frame rate
+TIMESTEP = 1000 / FRAME_RATE
+
+
+class RealClock:
+    """
+    Wall-clock time in milliseconds since the clock was created or reset
+
+    tick throttles to frame_rate, or returns immediately if frame_rate is None.
+    """
+
+    def __init__(self, frame_rate=FRAME_RATE) -> None:
+        self.frame_rate = frame_rate
+        self.clock = pygame.time.Clock()
+        self.start = pygame.time.get_ticks()
+
+        return None
+
+    def get_ticks(self) -> int:
+        return pygame.time.get_ticks() - self.start
+
+    def tick(self) -> None:
+        if self.frame_rate is not None:
+            self.clock.tick(self.frame_rate)
+
+        return None
+
+    def reset(self) -> None:
+        self.start = pygame.time.get_ticks()
+
+        return None
+
+
+class SimulationClock:
+    """
+    Simulated time in milliseconds that advances a fixed timestep per tick
+
+    Runs go as fast as the CPU allows and their timing does not depend on load.
+    """
+
+    def __init__(self, timestep=TIMESTEP) -> None:
+        self.timestep = timestep
+        self.time = 0
+
+        return None
+
+    def get_ticks(self) -> float:
+        return self.time
+
+    def tick(self) -> None:
+        self.time += self.timestep
+
+        return None
+
+    def reset(self) -> None:
+        self.time = 0
+
+        return None
@@ -0,0 +1,290 @@
+import argparse
+import copy
+import os
+import platform
+import random
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+from agent import ConvAgent
+from game_env import RobotTourEnv
+
+# Quantized backends int8 models can be exported for; the Raspberry Pi runs qnnpack
+ENGINES = ["qnnpack", "x86", "fbgemm", "onednn"]
+
+
+def get_host_engine() -> str:
+    # ARM hosts report "aarch64" (64-bit) or "armv7l" and similar (32-bit)
+    machine = platform.machine().lower()
+    if machine.startswith(("arm", "aarch64")):
+        return "qnnpack"
+
+    return "x86"
+
+
+class ExportAgent(nn.Module):
+    """
+    ConvAgent forward pass for batched inputs only, sharing the agent's layers
+
+    ConvAgent.forward branches on the number of image dimensions, which tracing bakes
+    in and FX cannot trace, so exported models always take a batch of images of shape
+    (N, 3, 64, 64) and times of shape (N, 1).
+    """
+
+    def __init__(self, agent: ConvAgent) -> None:
+        super(ExportAgent, self).__init__()
+        self.conv_layers = agent.conv_layers
+        self.fc_combined = agent.fc_combined
+
+    def forward(self, x_img, x_time):
+        # Broadcast the time over the image as an extra channel
+        x_time = x_time.reshape(-1, 1, 1, 1).expand(-1, 1, x_img.size(2), x_img.size(3))
+        x_combined = torch.cat((x_img, x_time), dim=1)
+
+        x = self.conv_layers(x_combined)
+        x = torch.flatten(x, 1)
+
+        return self.fc_combined(x)
+
+
+def record_observations(count, seed=0, policy=None) -> tuple:
+    """
+    Records observations from headless runs, for calibration and comparisons
+
+    param count: number of observations
+    param seed: seed for the boards and the random actions
+    param policy: optional function of a state returning an action, random if None
+
+    return: images of shape (count, 3, 64, 64) and times of shape (count, 1)
+    """
+
+    rng = random.Random(seed)
+    environment = RobotTourEnv(headless=True)
+    state = environment.reset(seed=seed)
+    images = []
+    times = []
+
+    while len(images) < count:
+        images.append(state["board_image"].clone())
+        times.append(float(state["time"]))
+
+        # Random actions other than ending the run, so runs last until they time out
+        action = rng.randrange(6) if policy is None else policy(state)
+        state, _, done, _ = environment.step(action)
+        if done:
+            state = environment.reset(seed=rng.getrandbits(32))
+
+    return torch.stack(images), torch.tensor(times, dtype=torch.float32)[:, None]
+
+
+def export_torchscript(model: nn.Module, path, example_inputs) -> None:
+    traced = torch.jit.trace(model.eval(), example_inputs)
+    torch.jit.save(traced, path)
+
+    return None
+
+
+def export_onnx(model: nn.Module, path, example_inputs, opset_version=17) -> None:
+    # The batch dimension stays dynamic, so the graph runs on one or many states
+    torch.onnx.export(
+        model.eval(),
+        example_inputs,
+        path,
+        input_names=["board_image", "time"],
+        output_names=["q_values"],
+        dynamic_axes={
+            "board_image": {0: "batch"},
+            "time": {0: "batch"},
+            "q_values": {0: "batch"},
+        },
+        opset_version=opset_version,
+        dynamo=False,
+    )
+
+    return None
+
+
+class OnnxModel:
+    """
+    Runs an exported ONNX graph with onnxruntime, taking and returning tensors
+
+    Wraps the session so compare and measure_latency can call it like the others.
+    """
+
+    def __init__(self, path) -> None:
+        import onnxruntime
+
+        self.session = onnxruntime.InferenceSession(
+            path, providers=["CPUExecutionProvider"]
+        )
+
+        return None
+
+    def __call__(self, images, times) -> torch.Tensor:
+        (q_values,) = self.session.run(
+            ["q_values"],
+            {"board_image": images.numpy(), "time": times.numpy()},
+        )
+
+        return torch.from_numpy(q_values)
+
+
+def quantize(model: nn.Module, images, times, batch_size=64, engine=None) -> nn.Module:
+    """
+    Int8 post-training quantization with FX graph mode, calibrated on observations
+
+    The first convolution stays in float: its input mixes pixels in [-1, 1] with
+    times in milliseconds, and a single int8 scale for both would erase the image.
+
+    param model: ExportAgent to quantize (it is not modified)
+    param images: calibration images
+    param times: calibration times
+    param batch_size: observations per calibration batch
+    param engine: quantized backend the model will run on (see ENGINES), the host's
+        if None
+
+    return: quantized model
+    """
+
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    if engine is None:
+        engine = get_host_engine()
+    torch.backends.quantized.engine = engine
+    qconfig_mapping = get_default_qconfig_mapping(engine).set_module_name(
+        "conv_layers.0", None
+    )
+
+    model = copy.deepcopy(model).eval()
+    prepared = prepare_fx(model, qconfig_mapping, (images[:1], times[:1]))
+    with torch.no_grad():
+        for start in range(0, len(images), batch_size):
+            prepared(
+                images[start : start + batch_size], times[start : start + batch_size]
+            )
+
+    return convert_fx(prepared)
+
+
+def measure_latency(model, images, times, iterations=200) -> dict:
+    # Per-decision latency: one observation per call, as when driving the robot
+    latencies = []
+    with torch.no_grad():
+        for i in range(iterations):
+            index = i % len(images)
+            start = time.perf_counter()
+            model(images[index : index + 1], times[index : index + 1])
+            latencies.append(time.perf_counter() - start)
+
+    latencies = np.asarray(latencies[iterations // 10 :])
+
+    return {
+        "p50_us": float(np.percentile(latencies, 50) * 1e6),
+        "p90_us": float(np.percentile(latencies, 90) * 1e6),
+        "p99_us": float(np.percentile(latencies, 99) * 1e6),
+    }
+
+
+def compare(reference, candidate, images, times, iterations=200) -> dict:
+    """
+    Compares an exported model's decisions and latency against the float model
+
+    param reference: float model
+    param candidate: exported or quantized model taking the same inputs
+    param images: evaluation images
+    param times: evaluation times
+    param iterations: single-observation calls timed per model
+
+    return: argmax agreement, largest Q-value difference (absolute and relative to the
+        largest Q-value) and latency of both models
+    """
+
+    with torch.no_grad():
+        expected = reference(images, times)
+        actual = candidate(images, times)
+
+    return {
+        "agreement": float((expected.argmax(1) == actual.argmax(1)).float().mean()),
+        "max_abs_error": float((expected - actual).abs().max()),
+        "relative_error": float(
+            (expected - actual).abs().max() / expected.abs().max().clamp_min(1e-12)
+        ),
+        "reference_latency": measure_latency(reference, images, times, iterations),
+        "latency": measure_latency(candidate, images, times, iterations),
+    }
+
+
+def load_agent(path, image_size=(3, 64, 64), time_size=1, output_size=7) -> ConvAgent:
+    # Checkpoints from train.save_model are plain ConvAgent state dicts
+    agent = ConvAgent(image_size, time_size, output_size)
+    agent.load_state_dict(torch.load(path, map_location="cpu"))
+
+    return agent.eval()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model", help="state dict saved by train.save_model")
+    parser.add_argument("--output-dir", default="exported")
+    parser.add_argument("--onnx", action="store_true", help="also export an ONNX graph")
+    parser.add_argument(
+        "--quantize",
+        action="store_true",
+        help="also export an int8 TorchScript model calibrated on recorded observations",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="qnnpack",
+        help="quantized backend of the device the int8 model will run on",
+    )
+    parser.add_argument("--calibration-steps", type=int, default=512)
+    parser.add_argument("--evaluation-steps", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    model = ExportAgent(load_agent(args.model)).eval()
+
+    # Calibration and evaluation use different runs
+    images, times = record_observations(args.evaluation_steps, seed=args.seed)
+    example_inputs = (images[:1], times[:1])
+
+    exported = {}
+    path = os.path.join(args.output_dir, "agent.pt")
+    export_torchscript(model, path, example_inputs)
+    exported[path] = torch.jit.load(path)
+
+    if args.onnx:
+        path = os.path.join(args.output_dir, "agent.onnx")
+        export_onnx(model, path, example_inputs)
+        print(f"ONNX graph saved to {path} ({os.path.getsize(path) / 1e6:.2f} MB)")
+
+        try:
+            exported[path] = OnnxModel(path)
+        except ImportError:
+            print("onnxruntime is not installed, skipping the ONNX comparison")
+
+    if args.quantize:
+        calibration_images, calibration_times = record_observations(
+            args.calibration_steps, seed=args.seed + 1
+        )
+        quantized = quantize(
+            model, calibration_images, calibration_times, engine=args.engine
+        )
+        path = os.path.join(args.output_dir, "agent_int8.pt")
+        export_torchscript(quantized, path, example_inputs)
+        exported[path] = torch.jit.load(path)
+
+    for path, candidate in exported.items():
+        result = compare(model, candidate, images, times)
+        print(
+            f"{path} ({os.path.getsize(path) / 1e6:.2f} MB): "
+            f"argmax agreement {result['agreement']:.1%}, "
+            f"max |dQ| {result['max_abs_error']:.4f} "
+            f"({result['relative_error']:.2%} of max |Q|), "
+            f"p50 {result['latency']['p50_us']:.0f} us "
+            f"(float {result['reference_latency']['p50_us']:.0f} us)"
+        )
@@ -1,14 +1,19 @@
 import math
+import os
 import random
 import sys
 import time
 import numpy as np
 import pygame
+import torch
 from torchvision import transforms
 from board import Board
+from clock import RealClock, SimulationClock
 from judge import Judge
-from robot import Robot
-
+from observation import FEATURE_SIZE, FeatureEncoder, ObservationRenderer
+from profiler import Profiler
+from renderer import LayeredRenderer
+from robot import Robot, clear_sprites
 
 # Set up colors
 WHITE = (255, 255, 255)
@@ -16,49 +21,145 @@ BLACK = (0, 0, 0)
 RED = (255, 0, 0)
 END_RUN_TEXT = None
 
+# State key holding the observation of each observation type
+OBSERVATION_KEYS = {"image": "board_image", "features": "features"}
+
+# Fonts shared by every Game in the process, keyed by size
+FONTS = {}
+
+
+def get_font(size) -> pygame.font.Font:
+    if size not in FONTS:
+        FONTS[size] = pygame.font.Font(None, size)
+
+    return FONTS[size]
+
 
 class Game:
-    def __init__(self) -> None:
-        # Initialize Pygame
-        pygame.init()
+    def __init__(
+        self,
+        headless=False,
+        seed=None,
+        board_code=None,
+        target_time=None,
+        simulated=None,
+        training=False,
+        profiler=None,
+        observation="image",
+    ) -> None:
+        # Headless games keep all movement, collision and scoring logic but never
+        # open a window; frames are only drawn offscreen when an observation is needed
+        self.headless = headless
+        if self.headless:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+        # Training games end runs without the blocking end screen or quitting pygame
+        self.training = training
+
+        # Per-phase timings, only collected when an enabled Profiler is passed in
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+
+        # Initialize Pygame, dropping fonts and sprites cached by an earlier session
+        # that ended with pygame.quit
+        if not pygame.get_init():
+            FONTS.clear()
+            clear_sprites()
+            pygame.init()
 
         # Set up fonts
-        self.font = pygame.font.Font(None, 36)
-        self.timer_font = pygame.font.Font(None, 24)
-        self.score_font = pygame.font.Font(None, 24)
-
-        # Main game loop
-        self.clock = pygame.time.Clock()
+        self.font = get_font(36)
+        self.timer_font = get_font(24)
+        self.score_font = get_font(24)
+
+        # Game time comes from a simulated fixed-timestep clock by default when
+        # headless, otherwise from the wall clock throttled to the frame rate
+        self.simulated = self.headless if simulated is None else simulated
+        if self.simulated:
+            self.clock = SimulationClock()
+        else:
+            self.clock = RealClock(frame_rate=None if self.headless else 60)
 
         # Create the Pygame window
         self.window_width = 1000
         self.window_height = 1000
-        self.window = pygame.display.set_mode((self.window_width, self.window_height))
-        pygame.display.set_caption("Robot Tour")
+        if self.headless:
+            self.window = None
+        else:
+            self.window = pygame.display.set_mode(
+                (self.window_width, self.window_height)
+            )
+            pygame.display.set_caption("Robot Tour")
 
         # Create a surface for drawing
         self.surface = pygame.Surface((self.window_width, self.window_height))
 
         # Create board
         self.grid_size = 4
-        self.board = Board(self.window, self.surface)
-        self.target_point = self.board.get_target_point()
+        self.board = Board(self.window, self.surface, seed=seed, code=board_code)
 
         # Create robot
         self.robot = Robot(self.surface)
+
+        # Create judge
+        self.judge = Judge(self.board, self.robot, target_time, self.clock)
+
+        # Frames for the window are drawn in layers, redrawing only what changed
+        if self.window is not None:
+            self.renderer = LayeredRenderer(
+                self.window, self.board, self.robot, self.profiler
+            )
+        else:
+            self.renderer = None
+
+        # Observations are rasterized from board and robot state, not the window
+        self.observation_renderer = ObservationRenderer(
+            (self.window_width, self.window_height)
+        )
+
+        # "features" observations are a state vector instead of a frame
+        self.observation = observation
+        self.feature_encoder = FeatureEncoder((self.window_width, self.window_height))
+
+        self.start_run(seed=seed, target_time=target_time)
+
+    def reset(self, seed=None, board_code=None, target_time=None) -> None:
+        """
+        Starts a new run in place, keeping the window, surface, fonts and sprite
+
+        param seed: seed for the board layout and target time
+        param board_code: encoded board layout to use instead of generating one
+        param target_time: target time in milliseconds, random if None
+        """
+
+        self.board.reset(seed=seed, code=board_code)
+        self.start_run(seed=seed, target_time=target_time)
+
+        return None
+
+    def start_run(self, seed=None, target_time=None) -> None:
+        self.target_point = self.board.get_target_point()
+
+        # Place the robot
+        self.robot.reset()
         self.robot.set_location(self.board.get_starting_point())
         self.robot.set_angle(self.board.get_starting_angle())
 
         # Timer variables - random target time between 50 and 75 seconds
-        self.target_time = random.randint(50, 75) * 1000
+        # Seeded runs draw it from its own stream, independent of the board layout's
+        if target_time is None:
+            rng = random.Random(f"{seed}-target-time") if seed is not None else random
+            target_time = rng.randint(50, 75) * 1000
+        self.target_time = target_time
+        self.clock.reset()
         self.timer_running = True
-        self.last_movement = pygame.time.get_ticks()
+        self.last_movement = self.clock.get_ticks()
 
-        # Create judge
-        self.judge = Judge(self.board, self.robot, self.target_time)
+        self.judge.reset(self.target_time)
 
         self.game_over = False
 
+        return None
+
     def is_over(self) -> bool:
         return self.game_over
 
@@ -115,60 +216,22 @@ class Game:
         ):
             self.robot.set_entered_grid()
 
-        # Check if the robot is hitting a blockade
-        for location in self.board.get_blockades().keys():
-            bx = (location[0] - 1) % grid_size
-            by = (location[0] - 1) // grid_size
-            blockade_size = self.board.get_blockade_size()
-            cardinality = location[1]
-
-            collision = False
-
-            if cardinality == "N":
-                blockade_x_start = grid_start_x + bx * cell_size
-                blockade_x_end = blockade_x_start + cell_size
-                blockade_y_start = blockade_y_end = grid_start_y + by * cell_size
-
-            elif cardinality == "E":
-                blockade_x_start = blockade_x_end = grid_start_x + (bx + 1) * cell_size
-                blockade_y_start = grid_start_y + by * cell_size
-                blockade_y_end = blockade_y_start + cell_size
-
-            elif cardinality == "S":
-                blockade_x_start = grid_start_x + bx * cell_size
-                blockade_x_end = blockade_x_start + cell_size
-                blockade_y_start = blockade_y_end = grid_start_y + (by + 1) * cell_size
+        # Check the board's precomputed collision map
+        collision = self.board.get_collision(
+            x, y, robot_size, self.robot.get_entered_grid()
+        )
 
-            elif cardinality == "W":
-                blockade_x_start = blockade_x_end = grid_start_x + bx * cell_size
-                blockade_y_start = grid_start_y + by * cell_size
-                blockade_y_end = blockade_y_start + cell_size
+        if collision is None:
+            return 0
 
-            if (
-                ((blockade_x_start - (x + robot_size)) < blockade_size)
-                and ((x - blockade_x_end) < blockade_size)
-                and ((blockade_y_start - (y + robot_size)) < blockade_size)
-                and ((y - blockade_y_end) < blockade_size)
-            ):
-                collision = True
-
-            if collision:
-                if not self.board.get_blockades()[location]:
-                    self.board.hit_blockade(location)
-                    return 1
-                else:
-                    return 2
-
-        # Check if the robot is outside the grid
-        if self.robot.get_entered_grid() and (
-            (x <= grid_start_x)
-            or (y <= grid_start_y)
-            or ((x + robot_size) >= (grid_start_x + cell_size * grid_size))
-            or ((y + robot_size) >= (grid_start_y + cell_size * grid_size))
-        ):
+        if collision == "border":
             return 2
 
-        return 0
+        if not self.board.get_blockades()[collision]:
+            self.board.hit_blockade(collision)
+            return 1
+
+        return 2
 
     def end_run(self) -> float:
         global END_RUN_TEXT
@@ -186,6 +249,12 @@ class Game:
 
         score = self.judge.get_final_score()
 
+        # Nothing to display without a window, so end the run immediately
+        if self.headless:
+            self.game_over = True
+
+            return score
+
         # Display text and end the game
         if END_RUN_TEXT is None:
             END_RUN_TEXT = self.font.render("Run over", True, BLACK)
@@ -223,129 +292,151 @@ class Game:
         # Update the display before quitting
         pygame.display.flip()
 
-        # Wait for 5 seconds (5000 milliseconds)
-        pygame.time.wait(5000)
+        # Training keeps pygame running so the next run can reuse it
+        if not self.training:
+            # Wait for 5 seconds (5000 milliseconds)
+            pygame.time.wait(5000)
 
-        # Quit the game
-        pygame.quit()
+            # Quit the game
+            pygame.quit()
 
         self.game_over = True
 
         return score
 
     def get_state(self) -> dict:
-        time_to_target = np.array(pygame.time.get_ticks() - self.target_time)
-        board_image = self.preprocess_image(self.surface)
+        time_to_target = np.array(self.clock.get_ticks() - self.target_time)
+        with self.profiler.phase("preprocess"):
+            if self.observation == "features":
+                observation = torch.empty(FEATURE_SIZE)
+                self.feature_encoder.encode(
+                    self.board, self.robot, time_to_target, out=observation.numpy()
+                )
+            else:
+                observation = self.observation_renderer.render(self.board, self.robot)
 
         return {
-            "board_image": board_image,
+            OBSERVATION_KEYS[self.observation]: observation,
             "time": time_to_target,
         }
 
-    def render(self) -> None:
+    def is_timed_out(self) -> bool:
+        elapsed_time = self.clock.get_ticks()
+
+        # End the run if the robot has not entered the grid after 10 seconds
+        if (not self.robot.get_entered_grid()) and ((elapsed_time // 1000) > 10):
+            return True
+
+        # End the run if the robot does not move forward or backward for three seconds
+        if ((self.clock.get_ticks() - self.last_movement) // 1000) > 3:
+            return True
+
+        return False
+
+    def draw(self) -> None:
         # Clear the screen
         self.surface.fill(WHITE)
 
         # Draw the target endpoint
         pygame.draw.circle(self.surface, RED, self.board.target_point, 10)
 
-        # Draw the speed information
-        speed_text = self.font.render(f"Speed: {self.robot.get_speed()}", True, BLACK)
-        self.window.blit(speed_text, (10, 70))
-
-        # Draw the time information
-        target_time_text = self.font.render(
-            f"Target time: {self.target_time / 1000}", True, BLACK
-        )
-        self.window.blit(target_time_text, (10, 100))
-
-        self.judge.check_bonus_zones()
-
         # Draw the board and robot
         self.board.draw()
         self.robot.draw()
 
-        # Blit the render_surface onto the main window
-        self.window.blit(self.surface, (0, 0))
-        pygame.display.flip()  # Update the entire display
-
-        # Draw the timer
-        if self.timer_running:
-            elapsed_time = pygame.time.get_ticks()
-            # End the run if the robot has not entered the grid after 10 seconds
-            if (not self.robot.get_entered_grid()) and ((elapsed_time // 1000) > 10):
-                return self.end_run()
-
-            # End the run if the robot does not move forward or backward for three seconds
-            if ((pygame.time.get_ticks() - self.last_movement) // 1000) > 3:
-                return self.end_run()
+        return None
 
-            elapsed_time_sec = elapsed_time // 1000
-            elapsed_time_ms = elapsed_time % 1000
-            timer_text = self.timer_font.render(
-                f"Time: {elapsed_time_sec}.{elapsed_time_ms} seconds", True, BLACK
-            )
-            self.window.blit(timer_text, (10, 10))
+    def render(self) -> None:
+        with self.profiler.phase("judge"):
+            self.judge.check_bonus_zones()
+            timed_out = self.timer_running and self.is_timed_out()
 
-            # Draw the score
-            score_text = self.score_font.render(
-                f"Score: {self.judge.get_score()}", True, BLACK
-            )
-            self.window.blit(score_text, (10, 40))
+        if timed_out:
+            return self.end_run()
 
-        # Update the display
-        pygame.display.flip()
+        # Headless games only draw when an observation is requested
+        if not self.headless:
+            with self.profiler.phase("draw"):
+                self.renderer.render(self.get_hud())
 
         # Control the frame rate
-        self.clock.tick(60)
+        with self.profiler.phase("tick"):
+            self.clock.tick()
 
-    def move_forward(self) -> None:
-        robot_location = self.robot.get_location()
-        robot_x = robot_location[0]
-        robot_y = robot_location[1]
-
-        # Calculate the movement based on the front angle
-        new_x = robot_x + self.robot.get_speed() * math.cos(
-            math.radians(self.robot.get_angle())
-        )
-        new_y = robot_y + self.robot.get_speed() * math.sin(
-            math.radians(self.robot.get_angle())
-        )
+        return None
 
-        collision = self.is_collision(new_x, new_y)
+    def get_hud(self) -> list:
+        hud = []
 
-        if collision == 0:
-            self.robot.set_location((new_x, new_y))
-            self.last_movement = pygame.time.get_ticks()
+        # Draw the timer and score
+        if self.timer_running:
+            elapsed_time = int(self.clock.get_ticks())
+            elapsed_time_sec = elapsed_time // 1000
+            elapsed_time_ms = elapsed_time % 1000
+            hud.append(
+                (
+                    f"Time: {elapsed_time_sec}.{elapsed_time_ms} seconds",
+                    self.timer_font,
+                    (10, 10),
+                )
+            )
+            hud.append((f"Score: {self.judge.get_score()}", self.score_font, (10, 40)))
 
-        elif collision == 1:
-            self.judge.update_score(50)
+        # Draw the speed and time information
+        hud.append((f"Speed: {self.robot.get_speed()}", self.font, (10, 70)))
+        hud.append((f"Target time: {self.target_time / 1000}", self.font, (10, 100)))
 
-        return None
+        return hud
 
-    def move_backward(self) -> None:
-        robot_location = self.robot.get_location()
-        robot_x = robot_location[0]
-        robot_y = robot_location[1]
+    def move(self, direction) -> None:
+        """
+        Moves the robot along its heading, stopping at the first contact on the way
 
-        # Calculate the movement based on the front angle
-        new_x = robot_x - self.robot.get_speed() * math.cos(
-            math.radians(self.robot.get_angle())
-        )
-        new_y = robot_y - self.robot.get_speed() * math.sin(
-            math.radians(self.robot.get_angle())
-        )
+        param direction: 1 to move forward, -1 to move backward
+        """
 
-        collision = self.is_collision(new_x, new_y)
+        with self.profiler.phase("move"):
+            robot_x, robot_y = self.robot.get_location()
+
+            # Calculate the movement based on the front angle
+            distance = direction * self.robot.get_speed()
+            dx = distance * math.cos(math.radians(self.robot.get_angle()))
+            dy = distance * math.sin(math.radians(self.robot.get_angle()))
+
+            with self.profiler.phase("collide"):
+                collision, contact, entered_grid = self.board.get_swept_collision(
+                    robot_x,
+                    robot_y,
+                    dx,
+                    dy,
+                    self.robot.get_size(),
+                    self.robot.get_entered_grid(),
+                )
+            if entered_grid:
+                self.robot.set_entered_grid()
+
+            # Move up to the contact point
+            if contact > 0:
+                self.robot.set_location(
+                    (robot_x + contact * dx, robot_y + contact * dy)
+                )
+                self.last_movement = self.clock.get_ticks()
+
+            # Only the first hit on a blockade is penalized
+            if (
+                collision not in (None, "border")
+                and not self.board.get_blockades()[collision]
+            ):
+                self.board.hit_blockade(collision)
+                self.judge.update_score(50)
 
-        if collision == 0:
-            self.robot.set_location((new_x, new_y))
-            self.last_movement = pygame.time.get_ticks()
+        return None
 
-        elif collision == 1:
-            self.judge.update_score(50)
+    def move_forward(self) -> None:
+        return self.move(1)
 
-        return None
+    def move_backward(self) -> None:
+        return self.move(-1)
 
     def increase_angle(self) -> None:
         self.run_timer()
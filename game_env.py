@@ -1,21 +1,75 @@
 import gym
 from gym import spaces
 import numpy as np
-from game import Game
+from game import Game, OBSERVATION_KEYS
+from observation import FEATURE_SIZE
+from profiler import Profiler
 
 
 class RobotTourEnv(gym.Env):
-    def __init__(self) -> None:
+    def __init__(
+        self, headless=False, profile=False, summary_every=None, observation="image"
+    ) -> None:
+        """
+        param headless: whether to run without a window
+        param profile: whether to time each phase of the simulation (see Profiler)
+        param summary_every: steps between printed profile summaries, never if None
+        param observation: "image" for 3x64x64 frames, "features" for state vectors
+        """
+
         super(RobotTourEnv, self).__init__()
-        self.game = Game()
+        self.headless = headless
+        self.profiler = Profiler(enabled=profile)
+        self.summary_every = summary_every
+        self.steps = 0
+        self.observation = observation
+        self.game = Game(
+            headless=self.headless,
+            training=True,
+            profiler=self.profiler,
+            observation=self.observation,
+        )
         self.action_space = spaces.Discrete(7)
-        self.observation_space = spaces.Box(
-            low=-np.inf, high=np.inf, shape=(4,), dtype=np.float32
+
+        # States hold the observation under state_key and the time to target in ms
+        self.state_key = OBSERVATION_KEYS[self.observation]
+        if self.observation == "features":
+            observation_space = spaces.Box(
+                low=-np.inf, high=np.inf, shape=(FEATURE_SIZE,), dtype=np.float32
+            )
+        else:
+            observation_space = spaces.Box(
+                low=-1, high=1, shape=(3, 64, 64), dtype=np.float32
+            )
+        self.observation_space = spaces.Dict(
+            {
+                self.state_key: observation_space,
+                "time": spaces.Box(
+                    low=-np.inf, high=np.inf, shape=(), dtype=np.float32
+                ),
+            }
         )
 
         return None
 
-    def step(self, action: int) -> (np.ndarray, float, bool):
+    def step(self, action: int) -> (dict, float, bool, dict):
+        with self.profiler.phase("step"):
+            state, reward, done = self.take_action(action)
+
+        return state, reward, done, self.get_info()
+
+    def get_info(self) -> dict:
+        info = {}
+        if self.profiler.enabled:
+            self.steps += 1
+            info["profile"] = self.profiler.get_stats()
+
+            if self.summary_every and self.steps % self.summary_every == 0:
+                print(f"Profile after {self.steps} steps:\n{self.profiler.summary()}")
+
+        return info
+
+    def take_action(self, action: int) -> (dict, float, bool):
         reward = 0
         done = False
         state = {}
@@ -47,8 +101,9 @@ class RobotTourEnv(gym.Env):
 
         return state, reward, done
 
-    def reset(self) -> np.ndarray:
-        self.game = Game()
+    def reset(self, seed=None, board_code=None, target_time=None) -> np.ndarray:
+        # Reuse the existing game instead of reinitializing pygame and its assets
+        self.game.reset(seed=seed, board_code=board_code, target_time=target_time)
         self.game.render()
 
         return self.game.get_state()
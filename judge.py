@@ -5,9 +5,14 @@ from robot import Robot
 
 
 class Judge:
-    def __init__(self, board: Board, robot: Robot, target_time):
+    def __init__(self, board: Board, robot: Robot, target_time, clock=None):
         self.board = board
         self.robot = robot
+        self.target_time = target_time
+        self.clock = clock
+        self.score = 100
+
+    def reset(self, target_time):
         self.target_time = target_time
         self.score = 100
 
@@ -33,6 +38,9 @@ class Judge:
         return score
 
     def calculate_elapsed_time(self):
+        if self.clock is not None:
+            return self.clock.get_ticks()
+
         return pygame.time.get_ticks()
 
     # Calculate the score based on time difference
@@ -49,9 +57,9 @@ class Judge:
     def check_bonus_zones(self):
         # Check if the robot is in a highlighted zone and award points
 
-        robot_location = self.robot.get_location()
-        robot_x = robot_location[0]
-        robot_y = robot_location[1]
+        # The zone is the one under the robot's center, which, unlike a corner, maps
+        # onto itself when the board is rotated or mirrored (see symmetry.py)
+        robot_x, robot_y = self.robot.get_front_location()
 
         current_zone = (
             (robot_x - self.board.grid_start_x) // self.board.cell_size
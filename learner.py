@@ -0,0 +1,111 @@
+import contextlib
+import torch
+import torch.nn.functional as F
+import torch.optim as optim
+from agent import bf16_supported
+
+
+class DQNLearner:
+    """
+    Deep Q-learning updates on minibatches of transitions
+
+    Target Q-values for the whole minibatch come from a single target_agent call,
+    and the agent is updated with one backward pass per minibatch.
+
+    On CPU, the loss can run under bfloat16 autocast and be compiled with
+    torch.compile. Both are opt-in and turn themselves off, with a message, when the
+    CPU has no native bfloat16 or compilation fails, so updates always run.
+    """
+
+    def __init__(
+        self, agent, target_agent, lr=0.001, gamma=0.99, bf16=False, compile=False
+    ) -> None:
+        """
+        param agent: agent being trained
+        param target_agent: agent computing the target Q-values
+        param lr: Adam learning rate
+        param gamma: discount factor
+        param bf16: whether to run forward passes under bfloat16 autocast
+        param compile: whether to compile the loss, forward passes included
+        """
+
+        self.agent = agent
+        self.target_agent = target_agent
+        self.gamma = gamma
+        self.optimizer = optim.Adam(self.agent.parameters(), lr=lr)
+        self.updates = 0
+
+        if bf16 and not bf16_supported():
+            print("bfloat16 autocast disabled: this CPU has no native bfloat16 support")
+            bf16 = False
+        self.bf16 = bf16
+
+        # Compiled lazily by torch on the first update
+        self.compiled_loss = None
+        if compile:
+            try:
+                self.compiled_loss = torch.compile(self.compute_loss)
+            except Exception as error:
+                print(f"torch.compile unavailable, training eagerly: {error}")
+
+        return None
+
+    def autocast(self):
+        if not self.bf16:
+            return contextlib.nullcontext()
+
+        return torch.autocast("cpu", dtype=torch.bfloat16)
+
+    def compute_loss(self, batch: dict) -> torch.Tensor:
+        # Q-values of the actions that were taken
+        q_values = self.agent(batch["images"], batch["times"])
+        current_q = q_values.gather(1, batch["actions"].unsqueeze(1)).squeeze(1)
+
+        # Compute target Q-values for the whole batch at once
+        with torch.no_grad():
+            next_q = self.target_agent(batch["next_images"], batch["next_times"])
+            target_q = batch["rewards"] + self.gamma * next_q.max(dim=1).values * (
+                1 - batch["dones"]
+            )
+
+        # Q-values may be bfloat16 under autocast, the loss is always float32
+        return F.mse_loss(current_q.float(), target_q.float())
+
+    def update(self, batch: dict) -> float:
+        """
+        Runs one gradient step on a minibatch sampled from a ReplayBuffer
+
+        param batch: dict of batched tensors, as returned by ReplayBuffer.sample
+
+        return: loss of the minibatch
+        """
+
+        self.optimizer.zero_grad()
+
+        if self.compiled_loss is not None:
+            try:
+                with self.autocast():
+                    loss = self.compiled_loss(batch)
+                loss.backward()
+            except Exception as error:
+                # Compilation happens on first use, so failures only show up here
+                print(f"torch.compile failed, training eagerly: {error}")
+                self.compiled_loss = None
+                self.optimizer.zero_grad()
+
+        if self.compiled_loss is None:
+            with self.autocast():
+                loss = self.compute_loss(batch)
+
+            # Backpropagation
+            loss.backward()
+
+        self.optimizer.step()
+        self.updates += 1
+
+        return loss.item()
+
+    def sync_target(self) -> None:
+        self.target_agent.load_state_dict(self.agent.state_dict())
+
+        return None
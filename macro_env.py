@@ -0,0 +1,179 @@
+import math
+from gym import spaces
+from game_env import RobotTourEnv
+
+# Screen angles of the cardinal headings (angles are clockwise, with 0 pointing east)
+HEADINGS = {"N": 270, "E": 0, "S": 90, "W": 180}
+
+# A 50 cm zone is 100 pixels wide
+PIXELS_PER_CM = 2
+
+# Distances offered by the "advance N cm" macro-actions
+ADVANCE_CM = [5, 25]
+
+# Macro-actions, in action number order
+MACRO_ACTIONS = (
+    [("rotate", heading) for heading in HEADINGS]
+    + [("advance_zone", None)]
+    + [("advance_cm", cm) for cm in ADVANCE_CM]
+    + [("end_run", None)]
+)
+
+
+class MacroRobotTourEnv(RobotTourEnv):
+    """
+    RobotTourEnv with macro-actions that each run many game ticks
+
+    Actions rotate to a cardinal heading, advance to the next zone center, advance a
+    fixed distance or end the run (see MACRO_ACTIONS). A macro-action turns 1 degree
+    or moves up to `speed` pixels per tick, renders every tick like a primitive
+    step, and stops early if the robot is blocked or the run ends. The reward is the
+    change in the Judge's score over the whole macro-action.
+    """
+
+    def __init__(
+        self,
+        headless=False,
+        speed=1,
+        profile=False,
+        summary_every=None,
+        observation="image",
+    ) -> None:
+        """
+        param headless: whether to run without a window
+        param speed: pixels moved per tick while advancing
+        param profile: whether to time each phase of the simulation (see Profiler)
+        param summary_every: steps between printed profile summaries, never if None
+        param observation: "image" for 3x64x64 frames, "features" for state vectors
+        """
+
+        super(MacroRobotTourEnv, self).__init__(
+            headless=headless,
+            profile=profile,
+            summary_every=summary_every,
+            observation=observation,
+        )
+        self.speed = speed
+        self.action_space = spaces.Discrete(len(MACRO_ACTIONS))
+
+        # Game ticks taken by the last macro-action
+        self.ticks = 0
+
+        return None
+
+    def get_action_meanings(self) -> list:
+        return [
+            name if argument is None else f"{name}_{argument}"
+            for name, argument in MACRO_ACTIONS
+        ]
+
+    def get_info(self) -> dict:
+        info = super(MacroRobotTourEnv, self).get_info()
+        info["ticks"] = self.ticks
+
+        return info
+
+    def take_action(self, action: int) -> (dict, float, bool):
+        name, argument = MACRO_ACTIONS[action]
+        previous_score = self.game.judge.get_score()
+        self.ticks = 0
+
+        if name == "end_run":
+            reward = previous_score - self.game.end_run()
+            return self.game.get_state(), reward, True
+
+        if name == "rotate":
+            self.rotate_to(HEADINGS[argument])
+        elif name == "advance_zone":
+            self.advance(self.get_zone_center_distance())
+        elif name == "advance_cm":
+            self.advance(argument * PIXELS_PER_CM)
+
+        state = self.game.get_state()
+        reward = previous_score - self.game.judge.get_score()
+        done = self.game.is_over()
+
+        return state, reward, done
+
+    def rotate_to(self, heading) -> None:
+        robot = self.game.robot
+
+        # Turn the shorter way around
+        turn = (heading - robot.get_angle()) % 360
+        if turn > 180:
+            turn -= 360
+
+        for _ in range(abs(turn)):
+            if self.game.is_over():
+                break
+
+            if turn > 0:
+                robot.increase_angle()
+            else:
+                robot.decrease_angle()
+            self.tick()
+
+        return None
+
+    def advance(self, distance) -> None:
+        robot = self.game.robot
+        speed = robot.get_speed()
+        remaining = distance
+
+        while remaining > 0 and not self.game.is_over():
+            step = min(self.speed, remaining)
+            robot.set_speed(step)
+
+            start_x, start_y = robot.get_location()
+            self.game.move_forward()
+            self.tick()
+            end_x, end_y = robot.get_location()
+
+            # Stop once something is in the way
+            moved = math.hypot(end_x - start_x, end_y - start_y)
+            if moved < step - 1e-9:
+                break
+            remaining -= step
+
+        robot.set_speed(speed)
+
+        return None
+
+    def get_zone_center_distance(self) -> float:
+        """
+        Distance along the robot's heading to the next zone center ahead
+
+        The heading is snapped to the nearest cardinal direction to pick the row or
+        column of zone centers, and the distance is measured along the actual heading.
+
+        return: distance in pixels
+        """
+
+        board = self.game.board
+        robot = self.game.robot
+        cell_size = board.get_cell_size()
+        grid_start_x, grid_start_y = board.get_grid_start()
+        center_x, center_y = robot.get_front_location()
+        direction_x = math.cos(math.radians(robot.get_angle()))
+        direction_y = math.sin(math.radians(robot.get_angle()))
+
+        if abs(direction_x) >= abs(direction_y):
+            center, grid_start, direction = center_x, grid_start_x, direction_x
+        else:
+            center, grid_start, direction = center_y, grid_start_y, direction_y
+
+        # Zone centers lie at grid_start + (k + 0.5) * cell_size
+        position = (center - grid_start) / cell_size - 0.5
+        if direction > 0:
+            next_center = math.floor(position + 1e-6) + 1
+        else:
+            next_center = math.ceil(position - 1e-6) - 1
+
+        return abs((next_center - position) * cell_size / direction)
+
+    def tick(self) -> None:
+        # One game frame, as rendered after every primitive action
+        self.game.render()
+        self.ticks += 1
+
+        return None
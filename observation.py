@@ -0,0 +1,294 @@
+import math
+import numpy as np
+import pygame
+import torch
+from board import (
+    Board,
+    BLOCKADE_LOCATIONS,
+    GRID_COLOR,
+    BONUS_COLOR,
+    BONUS_HIT_COLOR,
+    BLOCKADE_COLOR,
+    BLOCKADE_HIT_COLOR,
+)
+from robot import Robot
+
+WHITE = (255, 255, 255)
+RED = (255, 0, 0)
+
+# Layout of the feature observation vector
+POSE_FEATURES = 9
+BLOCKADE_FEATURES = POSE_FEATURES
+BLOCKADE_HIT_FEATURES = BLOCKADE_FEATURES + len(BLOCKADE_LOCATIONS)
+BONUS_FEATURES = BLOCKADE_HIT_FEATURES + len(BLOCKADE_LOCATIONS)
+BONUS_HIT_FEATURES = BONUS_FEATURES + 16
+FEATURE_SIZE = BONUS_HIT_FEATURES + 16
+
+# Longest target time in seconds, used to scale the time remaining
+MAX_TARGET_TIME = 75
+
+# Index of each blockade in the blockade masks, in the bit order of Board.encode
+BLOCKADE_INDICES = {location: i for i, location in enumerate(BLOCKADE_LOCATIONS)}
+
+
+class ObservationRenderer:
+    """
+    Rasterizes Board and Robot state straight into a low-resolution observation
+
+    Shapes are drawn with area coverage at the output resolution, which approximates
+    drawing the full window and shrinking it. Like the surfarray capture used by
+    Game.preprocess_image, frames are indexed [channel, x, y].
+    """
+
+    def __init__(
+        self, window_size=(1000, 1000), output_size=(64, 64), normalize=True
+    ) -> None:
+        self.window_size = window_size
+        self.output_size = output_size
+        self.normalize = normalize
+        self.scale_x = output_size[0] / window_size[0]
+        self.scale_y = output_size[1] / window_size[1]
+
+        # Preallocated drawing buffers
+        self.canvas = np.empty((3, *output_size), dtype=np.float32)
+        self.frame = np.empty((3, *output_size), dtype=np.uint8)
+
+        # The white background with grid lines only depends on the board geometry
+        self.background = None
+        self.background_key = None
+
+        # Average color and coverage of the robot sprite, keyed by sprite size
+        self.robot_colors = {}
+
+        return None
+
+    def coverage(self, start, end, scale, size):
+        # Fraction of each output pixel covered by the source interval [start, end)
+        low = max(int(math.floor(start * scale)), 0)
+        high = min(int(math.ceil(end * scale)), size)
+        if high <= low:
+            return low, None
+
+        edges = np.arange(low, high + 1, dtype=np.float32) / scale
+        covered = np.minimum(edges[1:], end) - np.maximum(edges[:-1], start)
+
+        return low, np.clip(covered * scale, 0, 1)
+
+    def fill_rect(self, canvas, x, y, width, height, color, alpha=1.0) -> None:
+        x_low, x_coverage = self.coverage(x, x + width, self.scale_x, canvas.shape[1])
+        y_low, y_coverage = self.coverage(y, y + height, self.scale_y, canvas.shape[2])
+        if x_coverage is None or y_coverage is None:
+            return None
+
+        region = canvas[
+            :, x_low : x_low + len(x_coverage), y_low : y_low + len(y_coverage)
+        ]
+        weight = alpha * np.outer(x_coverage, y_coverage)
+        color = np.asarray(color, dtype=np.float32)[:, None, None]
+        region += weight * (color - region)
+
+        return None
+
+    def draw_background(self, board: Board) -> np.ndarray:
+        grid_start_x, grid_start_y = board.get_grid_start()
+        cell_size = board.get_cell_size()
+        grid_size = board.get_grid_size()
+        key = (grid_start_x, grid_start_y, cell_size, grid_size)
+
+        if self.background_key != key:
+            background = np.empty_like(self.canvas)
+            background[:] = np.asarray(WHITE, dtype=np.float32)[:, None, None]
+
+            # One pixel cell outlines, as drawn by Board.draw_grid
+            for row in range(grid_size):
+                for col in range(grid_size):
+                    x = col * cell_size + grid_start_x
+                    y = row * cell_size + grid_start_y
+                    self.fill_rect(background, x, y, cell_size, 1, GRID_COLOR)
+                    self.fill_rect(
+                        background, x, y + cell_size - 1, cell_size, 1, GRID_COLOR
+                    )
+                    self.fill_rect(background, x, y, 1, cell_size, GRID_COLOR)
+                    self.fill_rect(
+                        background, x + cell_size - 1, y, 1, cell_size, GRID_COLOR
+                    )
+
+            self.background = background
+            self.background_key = key
+
+        return self.background
+
+    def get_robot_color(self, robot: Robot):
+        size = robot.get_size()
+
+        if size not in self.robot_colors:
+            # Average the sprite's color weighted by its alpha channel
+            colors = pygame.surfarray.array3d(robot.image).astype(np.float32)
+            alpha = pygame.surfarray.array_alpha(robot.image).astype(np.float32) / 255
+            coverage = float(alpha.mean())
+            color = (colors * alpha[:, :, None]).sum(axis=(0, 1)) / max(
+                alpha.sum(), 1e-6
+            )
+            self.robot_colors[size] = (tuple(color), coverage)
+
+        return self.robot_colors[size]
+
+    def draw(self, board: Board, robot: Robot) -> np.ndarray:
+        canvas = self.canvas
+        canvas[:] = self.draw_background(board)
+        cell_size = board.get_cell_size()
+        grid_size = board.get_grid_size()
+        grid_start_x, grid_start_y = board.get_grid_start()
+
+        # Target endpoint, as a square with the area of the drawn circle
+        target_x, target_y = board.get_target_point()
+        half_width = 10 * math.sqrt(math.pi) / 2
+        self.fill_rect(
+            canvas,
+            target_x - half_width,
+            target_y - half_width,
+            2 * half_width,
+            2 * half_width,
+            RED,
+        )
+
+        # Bonus zones
+        for zone_number, hit in board.get_bonus_zones().items():
+            x = ((zone_number - 1) % grid_size) * cell_size + grid_start_x
+            y = ((zone_number - 1) // grid_size) * cell_size + grid_start_y
+            self.fill_rect(
+                canvas,
+                x + 1,
+                y + 1,
+                cell_size - 1,
+                cell_size - 1,
+                BONUS_HIT_COLOR if hit else BONUS_COLOR,
+            )
+
+        # Blockades
+        blockade_size = board.get_blockade_size()
+        for location, hit in board.get_blockades().items():
+            start_point, end_point = board.get_blockade_segment(location)
+            x_start, x_end = sorted((start_point[0], end_point[0]))
+            y_start, y_end = sorted((start_point[1], end_point[1]))
+            self.fill_rect(
+                canvas,
+                x_start - blockade_size / 2,
+                y_start - blockade_size / 2,
+                x_end - x_start + blockade_size,
+                y_end - y_start + blockade_size,
+                BLOCKADE_HIT_COLOR if hit else BLOCKADE_COLOR,
+            )
+
+        # Robot body
+        robot_color, robot_coverage = self.get_robot_color(robot)
+        robot_x, robot_y = robot.get_location()
+        self.fill_rect(
+            canvas,
+            robot_x,
+            robot_y,
+            robot.get_size(),
+            robot.get_size(),
+            robot_color,
+            robot_coverage,
+        )
+
+        # Dowel, as a run of small squares along the line
+        front_x, front_y = robot.get_front_location()
+        dowel_x, dowel_y = robot.get_dowel_location()
+        width = robot.get_dowel_width()
+        steps = max(int(robot.dowel_length / width), 1)
+        for i in range(steps + 1):
+            x = front_x + (dowel_x - front_x) * i / steps
+            y = front_y + (dowel_y - front_y) * i / steps
+            self.fill_rect(canvas, x - width / 2, y - width / 2, width, width, RED)
+
+        np.rint(canvas, out=canvas)
+        np.copyto(self.frame, canvas, casting="unsafe")
+
+        return self.frame
+
+    def render(self, board: Board, robot: Robot, out=None) -> torch.Tensor:
+        """
+        Draws an observation of the board and robot
+
+        param board: Board object
+        param robot: Robot object
+        param out: optional float tensor to write into instead of allocating one
+
+        return: float tensor of shape (3, *output_size), in [-1, 1] if normalizing, else [0, 1]
+        """
+
+        frame = self.draw(board, robot)
+
+        if out is None:
+            out = torch.empty(frame.shape, dtype=torch.float32)
+
+        out.copy_(torch.from_numpy(frame))
+        if self.normalize:
+            out.div_(127.5).sub_(1)
+        else:
+            out.div_(255)
+
+        return out
+
+
+class FeatureEncoder:
+    """
+    Encodes Board and Robot state as a fixed-length float vector
+
+    The vector holds, in order: the robot center scaled to [-1, 1] over the window,
+    the cosine and sine of its heading, its speed over 10, the offset from the dowel
+    to the target over the grid width, the time remaining over MAX_TARGET_TIME
+    seconds, whether the robot has entered the grid, then 0/1 masks of the blockades
+    and of the blockades hit (in BLOCKADE_LOCATIONS order), of the bonus zones and of
+    the bonus zones claimed (zones 1 to 16).
+    """
+
+    def __init__(self, window_size=(1000, 1000)) -> None:
+        self.window_size = window_size
+        self.features = np.zeros(FEATURE_SIZE, dtype=np.float32)
+
+        return None
+
+    def encode(
+        self, board: Board, robot: Robot, time_to_target, out=None
+    ) -> np.ndarray:
+        """
+        param board: Board object
+        param robot: Robot object
+        param time_to_target: elapsed time minus target time, in milliseconds
+        param out: optional float32 array to write into instead of a shared buffer
+
+        return: float32 array of shape (FEATURE_SIZE,)
+        """
+
+        features = self.features if out is None else out
+        features[:] = 0
+
+        front_x, front_y = robot.get_front_location()
+        dowel_x, dowel_y = robot.get_dowel_location()
+        target_x, target_y = board.get_target_point()
+        radians = math.radians(robot.get_angle())
+        grid_width = board.get_cell_size() * board.get_grid_size()
+
+        features[0] = front_x / self.window_size[0] * 2 - 1
+        features[1] = front_y / self.window_size[1] * 2 - 1
+        features[2] = math.cos(radians)
+        features[3] = math.sin(radians)
+        features[4] = robot.get_speed() / 10
+        features[5] = (target_x - dowel_x) / grid_width
+        features[6] = (target_y - dowel_y) / grid_width
+        features[7] = -time_to_target / 1000 / MAX_TARGET_TIME
+        features[8] = robot.get_entered_grid()
+
+        for location, hit in board.get_blockades().items():
+            index = BLOCKADE_INDICES[location]
+            features[BLOCKADE_FEATURES + index] = 1
+            features[BLOCKADE_HIT_FEATURES + index] = hit
+
+        for zone_number, hit in board.get_bonus_zones().items():
+            features[BONUS_FEATURES + zone_number - 1] = 1
+            features[BONUS_HIT_FEATURES + zone_number - 1] = hit
+
+        return features
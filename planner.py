@@ -0,0 +1,181 @@
+import math
+from collections import deque, namedtuple
+from itertools import combinations, permutations
+from board import Board
+
+# Scoring from the README: each bonus zone entered is worth -15 points and the
+# distance score is 1 point per cm between the dowel and the target
+BONUS_POINTS = -15
+ZONE_CM = 50
+
+# Row and column offsets of each cardinal direction
+DIRECTIONS = {"N": (-1, 0), "E": (0, 1), "S": (1, 0), "W": (0, -1)}
+
+Layout = namedtuple(
+    "Layout",
+    ["start_zone", "start_edge", "target_zone", "blocked_edges", "bonus_zones"],
+)
+Plan = namedtuple("Plan", ["zones", "headings", "bonus_zones", "distance", "score"])
+
+
+def get_neighbor(zone, direction, grid_size=4):
+    row, col = divmod(zone - 1, grid_size)
+    row += DIRECTIONS[direction][0]
+    col += DIRECTIONS[direction][1]
+    if not (0 <= row < grid_size and 0 <= col < grid_size):
+        return None
+
+    return row * grid_size + col + 1
+
+
+def get_heading(zone, next_zone, grid_size=4):
+    for direction in DIRECTIONS:
+        if get_neighbor(zone, direction, grid_size) == next_zone:
+            return direction
+
+    return None
+
+
+def board_layout(board: Board) -> Layout:
+    """
+    Reads the layout a route has to be planned for from a Board
+
+    Zones are taken from where the starting point and target point actually are, and
+    blockades become blocked edges between neighboring zones. Bonus zones that were
+    already claimed are left out.
+
+    param board: Board object
+
+    return: Layout
+    """
+
+    grid_size = board.get_grid_size()
+    grid_start_x, grid_start_y = board.get_grid_start()
+    grid_end_x = grid_start_x + board.get_cell_size() * grid_size
+    grid_end_y = grid_start_y + board.get_cell_size() * grid_size
+
+    # The starting point sits on the perimeter, so find the edge it is on and
+    # nudge it onto the grid to find the zone it enters
+    start_x, start_y = board.get_starting_point()
+    if start_x <= grid_start_x:
+        start_edge = "W"
+    elif start_x >= grid_end_x:
+        start_edge = "E"
+    elif start_y <= grid_start_y:
+        start_edge = "N"
+    else:
+        start_edge = "S"
+    start_zone = board.get_zone(
+        (
+            min(max(start_x, grid_start_x + 1), grid_end_x - 1),
+            min(max(start_y, grid_start_y + 1), grid_end_y - 1),
+        )
+    )
+
+    blocked_edges = set()
+    for zone, cardinality in board.get_blockades().keys():
+        neighbor = get_neighbor(zone, cardinality, grid_size)
+        if neighbor is not None:
+            blocked_edges.add(frozenset((zone, neighbor)))
+
+    return Layout(
+        start_zone=start_zone,
+        start_edge=start_edge,
+        target_zone=board.get_zone(board.get_target_point()),
+        blocked_edges=frozenset(blocked_edges),
+        bonus_zones=frozenset(
+            zone for zone, hit in board.get_bonus_zones().items() if not hit
+        ),
+    )
+
+
+def shortest_paths(layout: Layout, source, grid_size=4) -> dict:
+    # Breadth-first search over the zone graph, returning the path to every reachable zone
+    paths = {source: [source]}
+    queue = deque([source])
+
+    while queue:
+        zone = queue.popleft()
+        for direction in DIRECTIONS:
+            neighbor = get_neighbor(zone, direction, grid_size)
+            if (
+                neighbor is None
+                or neighbor in paths
+                or frozenset((zone, neighbor)) in layout.blocked_edges
+            ):
+                continue
+
+            paths[neighbor] = paths[zone] + [neighbor]
+            queue.append(neighbor)
+
+    return paths
+
+
+def zone_distance(zone, other_zone, grid_size=4) -> float:
+    row, col = divmod(zone - 1, grid_size)
+    other_row, other_col = divmod(other_zone - 1, grid_size)
+
+    return math.hypot(row - other_row, col - other_col)
+
+
+def plan_layout(layout: Layout, grid_size=4) -> Plan:
+    """
+    Finds the route through the zone graph with the lowest score
+
+    Every ordering of every subset of reachable bonus zones is tried, joining the
+    stops with shortest paths, and routes are ranked by score and then by length.
+    Routes never cross a blocked edge, so they carry no obstacle penalties. If the
+    target cannot be reached, the distance score decides where the route ends.
+
+    param layout: Layout to plan for
+    param grid_size: number of zones along each side of the grid
+
+    return: Plan with the zones to visit, the heading of each move, the bonus zones
+        entered, the route length in cm and the score (excluding the time score)
+    """
+
+    from_start = shortest_paths(layout, layout.start_zone, grid_size)
+
+    stops = sorted(zone for zone in layout.bonus_zones if zone in from_start)
+    paths = {layout.start_zone: from_start}
+    for stop in stops:
+        paths[stop] = shortest_paths(layout, stop, grid_size)
+
+    best = None
+    for count in range(len(stops) + 1):
+        for subset in combinations(stops, count):
+            for order in permutations(subset):
+                route = [layout.start_zone]
+                for zone in order:
+                    route += paths[route[-1]][zone][1:]
+
+                # Usually the route ends on the target, but if the target is walled
+                # off it ends in whichever reachable zone scores best
+                for destination in from_start:
+                    full_route = route + paths[route[-1]][destination][1:]
+                    bonus_zones = layout.bonus_zones.intersection(full_route)
+                    score = (
+                        BONUS_POINTS * len(bonus_zones)
+                        + zone_distance(destination, layout.target_zone, grid_size)
+                        * ZONE_CM
+                    )
+                    key = (score, len(full_route), full_route)
+                    if best is None or key < best[0]:
+                        best = (key, full_route, bonus_zones)
+
+    (score, _, _), route, bonus_zones = best
+
+    return Plan(
+        zones=route,
+        headings=[
+            get_heading(zone, next_zone, grid_size)
+            for zone, next_zone in zip(route, route[1:])
+        ],
+        bonus_zones=frozenset(bonus_zones),
+        distance=(len(route) - 1) * ZONE_CM,
+        score=score,
+    )
+
+
+def plan(board: Board) -> Plan:
+    return plan_layout(board_layout(board), board.get_grid_size())
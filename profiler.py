@@ -0,0 +1,84 @@
+import time
+from collections import defaultdict
+
+
+class Phase:
+    # Context manager that adds its running time to one phase of a Profiler
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name) -> None:
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+
+        return False
+
+
+class NullPhase:
+    # Shared do-nothing phase handed out by disabled profilers
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+
+NULL_PHASE = NullPhase()
+
+
+class Profiler:
+    """
+    Cumulative time and call counts per named phase of the simulation
+
+    Code is instrumented with `with profiler.phase("move"):` blocks. Phases nest, so
+    a phase's time includes any phases inside it. A disabled profiler hands out a
+    shared no-op context manager, so instrumented code costs almost nothing.
+    """
+
+    def __init__(self, enabled=True) -> None:
+        self.enabled = enabled
+        self.times = defaultdict(float)
+        self.calls = defaultdict(int)
+
+        return None
+
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_PHASE
+
+        return Phase(self, name)
+
+    def record(self, name, seconds) -> None:
+        self.times[name] += seconds
+        self.calls[name] += 1
+
+        return None
+
+    def get_stats(self) -> dict:
+        return {
+            name: {"time": self.times[name], "calls": self.calls[name]}
+            for name in self.times
+        }
+
+    def reset(self) -> None:
+        self.times.clear()
+        self.calls.clear()
+
+        return None
+
+    def summary(self) -> str:
+        lines = [f"{'phase':12s} {'total s':>10s} {'calls':>10s} {'mean us':>10s}"]
+        for name, seconds in sorted(self.times.items(), key=lambda item: -item[1]):
+            calls = self.calls[name]
+            lines.append(
+                f"{name:12s} {seconds:10.3f} {calls:10d} {seconds / calls * 1e6:10.1f}"
+            )
+
+        return "\n".join(lines)
@@ -0,0 +1,94 @@
+import pygame
+from board import Board
+from profiler import Profiler
+from robot import Robot
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+RED = (255, 0, 0)
+
+
+class LayeredRenderer:
+    """
+    Draws frames to the window as a cached static layer plus dirty rectangles
+
+    The static layer holds the background, target, grid, bonus zones and blockades.
+    It is only redrawn when the board's version changes, which happens when a
+    blockade is hit, a bonus zone is claimed or a new layout is loaded. Every other
+    frame restores the static layer under last frame's robot and HUD text, draws
+    them at their new positions and updates only those rectangles on the display.
+    """
+
+    def __init__(
+        self, window: pygame.Surface, board: Board, robot: Robot, profiler=None
+    ) -> None:
+        self.window = window
+        self.board = board
+        self.robot = robot
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+
+        self.static_layer = pygame.Surface(window.get_size()).convert()
+        self.static_version = None
+
+        # Rectangles drawn over the static layer last frame
+        self.dirty_rects = []
+
+        # Rendered HUD text, keyed by position, reused until the text changes
+        self.text_cache = {}
+
+        return None
+
+    def invalidate(self) -> None:
+        # Force a full redraw on the next frame, e.g. after drawing over the window
+        self.static_version = None
+
+        return None
+
+    def draw_static_layer(self) -> None:
+        self.static_layer.fill(WHITE)
+
+        # Draw the target endpoint
+        pygame.draw.circle(self.static_layer, RED, self.board.get_target_point(), 10)
+
+        self.board.draw(surface=self.static_layer)
+        self.static_version = self.board.get_version()
+
+        return None
+
+    def render_text(self, text, font, position) -> pygame.Surface:
+        cached = self.text_cache.get(position)
+        if cached is None or cached[0] != text or cached[1] is not font:
+            cached = (text, font, font.render(text, True, BLACK))
+            self.text_cache[position] = cached
+
+        return cached[2]
+
+    def render(self, hud=()) -> None:
+        """
+        Draws a frame and updates the display once
+
+        param hud: (text, font, position) for each line of HUD text
+        """
+
+        if self.static_version != self.board.get_version():
+            # The board changed, so redraw the static layer and the whole window
+            self.draw_static_layer()
+            self.window.blit(self.static_layer, (0, 0))
+            update_rects = [self.window.get_rect()]
+        else:
+            # Erase last frame's robot and HUD text
+            for rect in self.dirty_rects:
+                self.window.blit(self.static_layer, rect, rect)
+            update_rects = self.dirty_rects
+
+        dirty_rects = [self.robot.draw(surface=self.window)]
+        for text, font, position in hud:
+            dirty_rects.append(
+                self.window.blit(self.render_text(text, font, position), position)
+            )
+
+        with self.profiler.phase("flip"):
+            pygame.display.update(update_rects + dirty_rects)
+        self.dirty_rects = dirty_rects
+
+        return None
@@ -0,0 +1,333 @@
+import contextlib
+import json
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+import numpy as np
+import torch
+
+
+class ReplayBuffer:
+    """
+    Fixed-capacity ring buffer of transitions
+
+    Frames are stored as uint8 and converted back to normalized float tensors when
+    sampled. Other observations, such as feature vectors, are stored with their own
+    observation_dtype and shape and returned as they are. Storage is allocated once
+    up front, either in memory or, when a directory is given, as memory-mapped .npy
+    files so that capacity can exceed RAM. A shared buffer can be passed to other
+    processes, which then add to and sample from the same storage.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        image_shape=(3, 64, 64),
+        directory=None,
+        normalize=True,
+        seed=None,
+        shared=False,
+        observation_dtype=np.uint8,
+    ) -> None:
+        self.capacity = capacity
+        self.image_shape = tuple(image_shape)
+        self.observation_dtype = np.dtype(observation_dtype)
+        self.directory = directory
+        self.normalize = normalize
+        self.shared = shared
+        self.rng = np.random.default_rng(seed)
+
+        # Shared memory blocks used by this buffer, unlinked on close by the owner
+        self.shared_blocks = {}
+        self.owner = True
+
+        # Ring position and size live in an array so they can be shared too
+        self.counters = self.allocate_shared("counters", (2,), np.int64)
+        self.lock = multiprocessing.get_context("spawn").Lock() if self.shared else None
+
+        fields = {
+            "images": (self.image_shape, self.observation_dtype),
+            "times": ((), np.float32),
+            "actions": ((), np.int64),
+            "rewards": ((), np.float32),
+            "next_images": (self.image_shape, self.observation_dtype),
+            "next_times": ((), np.float32),
+            "dones": ((), np.bool_),
+        }
+
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+
+        # Reopen an existing memory-mapped buffer, which must have the same layout;
+        # allocating over it would overwrite the stored transitions
+        reopen = self.directory is not None and os.path.exists(self.get_meta_path())
+        if reopen:
+            with open(self.get_meta_path()) as f:
+                meta = json.load(f)
+
+            stored = (
+                meta["capacity"],
+                tuple(meta["image_shape"]),
+                meta.get("observation_dtype", "uint8"),
+            )
+            requested = (
+                self.capacity,
+                self.image_shape,
+                self.observation_dtype.name,
+            )
+            if stored != requested:
+                raise ValueError(
+                    f"Buffer in {self.directory} has (capacity, image_shape, "
+                    f"observation_dtype) {stored}, not {requested}"
+                )
+
+        self.storage = {}
+        for name, (shape, dtype) in fields.items():
+            self.storage[name] = self.allocate(name, shape, dtype, reopen)
+
+        if reopen:
+            self.position = meta["position"]
+            self.size = meta["size"]
+
+        return None
+
+    @property
+    def position(self) -> int:
+        return int(self.counters[0])
+
+    @position.setter
+    def position(self, value) -> None:
+        self.counters[0] = value
+
+    @property
+    def size(self) -> int:
+        return int(self.counters[1])
+
+    @size.setter
+    def size(self, value) -> None:
+        self.counters[1] = value
+
+    def locked(self):
+        return self.lock if self.lock is not None else contextlib.nullcontext()
+
+    def allocate_shared(self, name, shape, dtype) -> np.ndarray:
+        if not self.shared:
+            return np.zeros(shape, dtype=dtype)
+
+        nbytes = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+        block = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.shared_blocks[name] = (block, shape, dtype)
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        array[:] = 0
+
+        return array
+
+    def get_meta_path(self) -> str:
+        return os.path.join(self.directory, "buffer.json")
+
+    def allocate(self, name, shape, dtype, reopen=False) -> np.ndarray:
+        shape = (self.capacity, *shape)
+
+        if self.directory is None:
+            return self.allocate_shared(name, shape, dtype)
+
+        filename = os.path.join(self.directory, f"{name}.npy")
+        if reopen:
+            return np.load(filename, mmap_mode="r+")
+
+        return np.lib.format.open_memmap(filename, mode="w+", dtype=dtype, shape=shape)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def quantize(self, image) -> np.ndarray:
+        # uint8 frames are stored as they are, float frames are mapped back to 0-255
+        if isinstance(image, torch.Tensor):
+            image = image.detach().cpu().numpy()
+
+        image = np.asarray(image)
+        if image.dtype == np.uint8:
+            return image
+
+        # Observations that are not frames are stored unchanged
+        if self.observation_dtype != np.uint8:
+            return image.astype(self.observation_dtype, copy=False)
+
+        if self.normalize:
+            image = (image + 1) * 127.5
+        else:
+            image = image * 255
+
+        return np.clip(np.rint(image), 0, 255).astype(np.uint8)
+
+    def dequantize(self, images) -> torch.Tensor:
+        images = torch.from_numpy(np.ascontiguousarray(images)).float()
+
+        if self.observation_dtype != np.uint8:
+            return images
+
+        if self.normalize:
+            return images.div_(127.5).sub_(1)
+
+        return images.div_(255)
+
+    def add(self, image, time, action, reward, next_image, next_time, done) -> None:
+        """
+        Stores one transition, overwriting the oldest once the buffer is full
+
+        param image: observed frame, either uint8 or a float tensor from get_state
+        param time: observed time to target
+        param action: action taken
+        param reward: reward received
+        param next_image: frame observed after the action
+        param next_time: time to target after the action
+        param done: whether the episode ended
+        """
+
+        image = self.quantize(image)
+        next_image = self.quantize(next_image)
+
+        with self.locked():
+            index = self.position
+            self.storage["images"][index] = image
+            self.storage["times"][index] = time
+            self.storage["actions"][index] = action
+            self.storage["rewards"][index] = reward
+            self.storage["next_images"][index] = next_image
+            self.storage["next_times"][index] = next_time
+            self.storage["dones"][index] = done
+
+            self.position = (index + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+        return None
+
+    def sample(self, batch_size: int) -> dict:
+        """
+        Samples a uniform random minibatch of stored transitions
+
+        return: dict of batched tensors with the same keys as the storage
+        """
+
+        with self.locked():
+            indices = self.rng.integers(0, self.size, size=batch_size)
+            indices.sort()
+            batch = {name: array[indices] for name, array in self.storage.items()}
+
+        return {
+            "images": self.dequantize(batch["images"]),
+            "times": torch.from_numpy(batch["times"]),
+            "actions": torch.from_numpy(batch["actions"]),
+            "rewards": torch.from_numpy(batch["rewards"]),
+            "next_images": self.dequantize(batch["next_images"]),
+            "next_times": torch.from_numpy(batch["next_times"]),
+            "dones": torch.from_numpy(batch["dones"]).float(),
+        }
+
+    def flush(self) -> None:
+        # Write memory-mapped storage and the ring position to disk
+        if self.directory is None:
+            return None
+
+        for array in self.storage.values():
+            array.flush()
+
+        with open(self.get_meta_path(), "w") as f:
+            json.dump(
+                {
+                    "capacity": self.capacity,
+                    "image_shape": list(self.image_shape),
+                    "observation_dtype": self.observation_dtype.name,
+                    "position": self.position,
+                    "size": self.size,
+                },
+                f,
+            )
+
+        return None
+
+    def state_dict(self) -> dict:
+        """
+        Copies the stored transitions, ring position and sampling RNG state
+
+        return: dict that load_state_dict restores the buffer from
+        """
+
+        with self.locked():
+            size = self.size
+            return {
+                "position": self.position,
+                "size": size,
+                "rng": self.rng.bit_generator.state,
+                "storage": {
+                    name: np.array(array[:size]) for name, array in self.storage.items()
+                },
+            }
+
+    def load_state_dict(self, state: dict) -> None:
+        with self.locked():
+            size = state["size"]
+            for name, array in state["storage"].items():
+                self.storage[name][:size] = array[:size]
+
+            self.position = state["position"]
+            self.size = size
+            self.rng.bit_generator.state = state["rng"]
+
+        return None
+
+    def close(self) -> None:
+        # Release shared memory; only the process that created the buffer unlinks it
+        for block, _, _ in self.shared_blocks.values():
+            block.close()
+            if self.owner:
+                block.unlink()
+
+        self.shared_blocks = {}
+
+        return None
+
+    def __getstate__(self) -> dict:
+        if not self.shared:
+            return self.__dict__
+
+        # Other processes reattach to shared memory and memory-mapped files by name
+        state = dict(self.__dict__)
+        state["storage"] = list(self.storage)
+        state["counters"] = None
+        state["shared_blocks"] = {
+            name: (block.name, shape, dtype)
+            for name, (block, shape, dtype) in self.shared_blocks.items()
+        }
+
+        return state
+
+    def __setstate__(self, state) -> None:
+        if not state["shared"]:
+            self.__dict__.update(state)
+            return None
+
+        blocks = state.pop("shared_blocks")
+        self.__dict__.update(state)
+        self.shared_blocks = {}
+        self.owner = False
+        self.rng = np.random.default_rng()
+
+        arrays = {}
+        for name, (block_name, shape, dtype) in blocks.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            self.shared_blocks[name] = (block, shape, dtype)
+            arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+        self.counters = arrays.pop("counters")
+        if self.directory is None:
+            self.storage = arrays
+        else:
+            self.storage = {
+                name: np.load(
+                    os.path.join(self.directory, f"{name}.npy"), mmap_mode="r+"
+                )
+                for name in state["storage"]
+            }
+
+        return None
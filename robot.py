@@ -3,20 +3,58 @@ import pygame
 
 RED = (255, 0, 0)
 
+# Scaled robot sprites shared by every Robot in the process, keyed by size
+SPRITES = {}
+
+
+def load_sprite(size) -> pygame.Surface:
+    if size not in SPRITES:
+        image = pygame.image.load("robot.png")
+        SPRITES[size] = pygame.transform.scale(image, (size, size))
+
+    return SPRITES[size]
+
+
+# Rotated robot sprites shared by every Robot in the process, keyed by size and
+# whole-degree angle, so each rotation is only resampled once
+ROTATED_SPRITES = {}
+
+
+def load_rotated_sprite(size, angle) -> pygame.Surface:
+    angle = round(angle) % 360
+    if (size, angle) not in ROTATED_SPRITES:
+        ROTATED_SPRITES[(size, angle)] = pygame.transform.rotate(
+            load_sprite(size), angle
+        )
+
+    return ROTATED_SPRITES[(size, angle)]
+
+
+def clear_sprites() -> None:
+    # Sprites belong to a pygame session, so drop them when pygame is restarted
+    SPRITES.clear()
+    ROTATED_SPRITES.clear()
+
+    return None
+
 
 class Robot:
     def __init__(self, surface: pygame.Surface, starting_angle=0, size=30) -> None:
         self.surface = surface
         self.size = size
-        self.image = pygame.image.load("robot.png")
-        self.image = pygame.transform.scale(self.image, (self.size, self.size))
+        self.image = load_sprite(self.size)
         self.rect = self.image.get_rect()
         self.dowel_length = 20
         self.dowel_width = 2
+        self.reset(starting_angle)
+
+    def reset(self, starting_angle=0) -> None:
         self.speed = 1
         self.angle = starting_angle
         self.entered_grid = False
 
+        return None
+
     def get_size(self) -> int:
         return self.size
 
@@ -55,6 +93,9 @@ class Robot:
     def get_speed(self) -> int:
         return self.speed
 
+    def set_speed(self, speed) -> None:
+        self.speed = speed
+
     def increase_speed(self, interval=None) -> None:
         if interval is None:
             self.speed += 1
@@ -85,21 +126,26 @@ class Robot:
     def get_dowel_width(self) -> int:
         return self.dowel_width
 
-    def draw(self):
+    def draw(self, surface=None) -> pygame.Rect:
+        surface = self.surface if surface is None else surface
+
         # Draw the robots
-        rotated_robot = pygame.transform.rotate(self.image, self.angle)
+        rotated_robot = load_rotated_sprite(self.size, self.angle)
         rotated_rect = rotated_robot.get_rect(
             center=(self.x + self.size / 2, self.y + self.size / 2)
         )
 
         # Blit the rotated image onto the surface
-        self.surface.blit(rotated_robot, rotated_rect.topleft)
+        robot_rect = surface.blit(rotated_robot, rotated_rect.topleft)
 
         # Draw the front of the robot
-        pygame.draw.line(
-            self.surface,
+        dowel_rect = pygame.draw.line(
+            surface,
             RED,
             self.get_front_location(),
             self.get_dowel_location(),
             self.dowel_width,
         )
+
+        # Area of the surface that was drawn on
+        return robot_rect.union(dowel_rect)
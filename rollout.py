@@ -0,0 +1,154 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import torch
+from replay import ReplayBuffer
+
+
+class PipelinedRollout:
+    """
+    Steps groups of envs in a worker thread while the agent picks actions for another
+
+    Envs are split into num_groups groups. While the worker thread steps one group,
+    the calling thread runs one batched agent forward pass for the next group, and
+    anything the caller does between calls to advance (such as learner updates)
+    overlaps with stepping too. Torch releases the GIL inside its kernels, so env code
+    and inference really run at the same time. Each env is only ever touched by one
+    thread at a time, and actions are the same greedy argmax as in train.train.
+    """
+
+    def __init__(
+        self, agent, environments, num_groups=2, replay: ReplayBuffer = None
+    ) -> None:
+        """
+        param agent: agent taking batched (observation, time) and returning Q-values
+        param environments: envs to step, all with the same observation type
+        param num_groups: number of groups the envs are split into, at least 2
+        param replay: optional ReplayBuffer that transitions are added to
+        """
+
+        self.agent = agent
+        self.environments = environments
+        self.replay = replay
+        self.state_key = environments[0].state_key
+        self.groups = [
+            list(group)
+            for group in np.array_split(np.arange(len(environments)), num_groups)
+            if len(group) > 0
+        ]
+
+        # With one group, actions would be picked from states the worker is updating
+        if len(self.groups) < 2:
+            raise ValueError(
+                "PipelinedRollout needs at least 2 groups of envs, "
+                f"got {len(environments)} envs in {num_groups} groups"
+            )
+
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.states = [None] * len(environments)
+        self.episode_rewards = [0.0] * len(environments)
+
+        # Returns of the episodes finished since the last call to pop_finished
+        self.finished = []
+
+        # Group being stepped by the worker thread, and its pending result
+        self.in_flight = None
+        self.future = None
+
+        return None
+
+    def act(self, group) -> list:
+        states = [self.states[index] for index in group]
+        observations = torch.stack([state[self.state_key] for state in states])
+        times = torch.tensor(
+            np.array([[state["time"]] for state in states]), dtype=torch.float32
+        )
+
+        with torch.no_grad():
+            q_values = self.agent(observations, times)
+
+        return q_values.argmax(dim=1).tolist()
+
+    def step_group(self, group, actions) -> list:
+        # Runs in the worker thread
+        transitions = []
+        for index, action in zip(group, actions):
+            environment = self.environments[index]
+            state = self.states[index]
+            new_state, reward, done, _ = environment.step(action)
+            transitions.append((index, state, action, reward, new_state, done))
+
+            if done:
+                new_state = environment.reset()
+            self.states[index] = new_state
+
+        return transitions
+
+    def start(self) -> None:
+        for index, environment in enumerate(self.environments):
+            self.states[index] = environment.reset()
+
+        self.in_flight = 0
+        self.future = self.executor.submit(
+            self.step_group, self.groups[0], self.act(self.groups[0])
+        )
+
+        return None
+
+    def advance(self) -> list:
+        """
+        Picks actions for the next group, collects the group in flight and hands the
+        next group to the worker
+
+        return: (state, action, reward, next_state, done) for each env of the
+            collected group, which are also added to the replay buffer if there is one
+        """
+
+        if self.future is None:
+            self.start()
+
+        next_group = (self.in_flight + 1) % len(self.groups)
+        actions = self.act(self.groups[next_group])
+        transitions = self.future.result()
+
+        self.in_flight = next_group
+        self.future = self.executor.submit(
+            self.step_group, self.groups[next_group], actions
+        )
+
+        collected = []
+        for index, state, action, reward, new_state, done in transitions:
+            if self.replay is not None:
+                self.replay.add(
+                    state[self.state_key],
+                    state["time"],
+                    action,
+                    reward,
+                    new_state[self.state_key],
+                    new_state["time"],
+                    done,
+                )
+
+            self.episode_rewards[index] += reward
+            if done:
+                self.finished.append(self.episode_rewards[index])
+                self.episode_rewards[index] = 0.0
+
+            collected.append((state, action, reward, new_state, done))
+
+        return collected
+
+    def pop_finished(self) -> list:
+        finished = self.finished
+        self.finished = []
+
+        return finished
+
+    def close(self) -> None:
+        # Let the group in flight finish so no env is left mid-step
+        if self.future is not None:
+            self.future.result()
+            self.future = None
+
+        self.executor.shutdown()
+
+        return None
@@ -0,0 +1,79 @@
+import os
+import pickle
+from collections import OrderedDict
+from board import Board
+from planner import Layout, Plan, board_layout, plan_layout
+from symmetry import canonical_layout, inverse, transform_layout, transform_plan
+
+
+class RouteCache:
+    """
+    LRU cache of solved layouts, keyed on their canonical form under grid symmetries
+
+    Layouts that are rotations or reflections of a cached one are answered by mapping
+    the cached route back, so only one of the up to 8 equivalent layouts is solved.
+    """
+
+    def __init__(self, solver=plan_layout, maxsize=4096, path=None) -> None:
+        """
+        param solver: callable taking a Layout and returning a Plan
+        param maxsize: most layouts kept before the least recently used is evicted
+        param path: optional file to load the cache from and save it to
+        """
+
+        self.solver = solver
+        self.maxsize = maxsize
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        if self.path is not None and os.path.exists(self.path):
+            self.load()
+
+        return None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get_layout(self, layout: Layout) -> Plan:
+        key, symmetry = canonical_layout(layout)
+
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            canonical_plan = self.entries[key]
+        else:
+            # Solve the canonical layout so the answer serves every symmetric layout
+            self.misses += 1
+            canonical_plan = self.solver(transform_layout(layout, symmetry))
+            self.entries[key] = canonical_plan
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+        return transform_plan(canonical_plan, inverse(symmetry))
+
+    def get(self, board: Board) -> Plan:
+        return self.get_layout(board_layout(board))
+
+    def save(self, path=None) -> None:
+        path = path if path is not None else self.path
+
+        # Write to a temporary file first so an interrupted save keeps the old cache
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as f:
+            pickle.dump(list(self.entries.items()), f)
+        os.replace(temporary_path, path)
+
+        return None
+
+    def load(self, path=None) -> None:
+        path = path if path is not None else self.path
+
+        with open(path, "rb") as f:
+            self.entries = OrderedDict(pickle.load(f))
+
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+        return None
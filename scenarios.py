@@ -0,0 +1,153 @@
+import numpy as np
+from board import (
+    Board,
+    BLOCKADE_LOCATIONS,
+    STARTING_SIDES,
+    STARTING_ZONES,
+    pack_code,
+)
+
+# One row per scenario; the id is also the row number
+SCENARIO_DTYPE = np.dtype(
+    [
+        ("id", np.uint64),
+        ("blockades", np.uint64),
+        ("bonus_zones", np.uint16),
+        ("starting_zone", np.uint8),
+        ("starting_side", np.uint8),
+        ("target_zone", np.uint8),
+        ("target_time", np.uint8),
+    ]
+)
+
+BLOCKADE_ZONES = np.array([location[0] for location in BLOCKADE_LOCATIONS])
+CORNER_ZONES = [1, 4, 13, 16]
+
+
+def generate_batch(rng: np.random.Generator, size: int, first_id=0) -> np.ndarray:
+    """
+    Generates scenarios with the same rules as Board, vectorized over a batch
+
+    Blockades follow Board.set_blockades: 1 to 8 distinct blockades, at most 3 per
+    zone and at most 2 in the starting zone. Drawing blockades at random and skipping
+    ones that are taken or over a cap is the same as walking a random permutation of
+    all blockades and keeping each that still fits, which is what is done here.
+
+    param rng: NumPy random generator
+    param size: number of scenarios
+    param first_id: id of the first scenario in the batch
+
+    return: structured array of SCENARIO_DTYPE
+    """
+
+    rows = np.arange(size)
+    batch = np.zeros(size, dtype=SCENARIO_DTYPE)
+    batch["id"] = first_id + rows
+
+    starting_zone = np.array(STARTING_ZONES)[rng.integers(0, len(STARTING_ZONES), size)]
+    corner = np.isin(starting_zone, CORNER_ZONES)
+    starting_side = np.where(
+        corner,
+        rng.integers(
+            STARTING_SIDES.index("top"), STARTING_SIDES.index("side") + 1, size
+        ),
+        STARTING_SIDES.index(None),
+    )
+
+    # Any zone but the starting one
+    target_zone = rng.integers(1, 16, size)
+    target_zone += target_zone >= starting_zone
+
+    # 1 to 4 distinct bonus zones: take the lowest ranked zones of a random ordering
+    num_bonus = rng.integers(1, 5, size)
+    ranks = rng.random((size, 16)).argsort(axis=1).argsort(axis=1)
+    bonus_mask = ranks < num_bonus[:, None]
+    bonus_zones = (bonus_mask * (1 << np.arange(16))).sum(axis=1)
+
+    num_blockades = rng.integers(1, 9, size)
+    order = rng.random((size, len(BLOCKADE_LOCATIONS))).argsort(axis=1)
+    zone_counts = np.zeros((size, 17), dtype=np.int64)
+    num_chosen = np.zeros(size, dtype=np.int64)
+    blockades = np.zeros(size, dtype=np.uint64)
+
+    for column in range(len(BLOCKADE_LOCATIONS)):
+        location = order[:, column]
+        zone = BLOCKADE_ZONES[location]
+        cap = np.where(zone == starting_zone, 2, 3)
+        keep = (num_chosen < num_blockades) & (zone_counts[rows, zone] < cap)
+
+        zone_counts[rows[keep], zone[keep]] += 1
+        num_chosen += keep
+        blockades |= keep.astype(np.uint64) << location.astype(np.uint64)
+
+    batch["blockades"] = blockades
+    batch["bonus_zones"] = bonus_zones
+    batch["starting_zone"] = starting_zone
+    batch["starting_side"] = starting_side
+    batch["target_zone"] = target_zone
+    batch["target_time"] = rng.integers(50, 76, size)
+
+    return batch
+
+
+def generate_corpus(path, count: int, seed=0, batch_size=65536) -> None:
+    """
+    Streams count scenarios into a memory-mapped .npy file
+
+    param path: .npy file to create
+    param count: number of scenarios
+    param seed: seed of the NumPy generator, so the same corpus can be rebuilt
+    param batch_size: scenarios generated per vectorized batch
+    """
+
+    rng = np.random.default_rng(seed)
+    scenarios = np.lib.format.open_memmap(
+        path, mode="w+", dtype=SCENARIO_DTYPE, shape=(count,)
+    )
+
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        scenarios[start : start + size] = generate_batch(rng, size, first_id=start)
+
+    scenarios.flush()
+    del scenarios
+
+    return None
+
+
+class ScenarioCorpus:
+    """
+    Read-only view of a scenario file
+
+    Opening is cheap because the file is memory-mapped, so every worker can open the
+    same corpus and look scenarios up by id.
+    """
+
+    def __init__(self, path) -> None:
+        self.path = path
+        self.scenarios = np.load(path, mmap_mode="r")
+
+        return None
+
+    def __len__(self) -> int:
+        return len(self.scenarios)
+
+    def get_code(self, scenario_id: int) -> int:
+        scenario = self.scenarios[scenario_id]
+
+        return pack_code(
+            int(scenario["blockades"]),
+            0,
+            int(scenario["bonus_zones"]),
+            0,
+            int(scenario["starting_zone"]),
+            int(scenario["starting_side"]),
+            int(scenario["target_zone"]),
+        )
+
+    def get_target_time(self, scenario_id: int) -> int:
+        # Target time in milliseconds, as used by Game and Judge
+        return int(self.scenarios[scenario_id]["target_time"]) * 1000
+
+    def get_board(self, scenario_id: int, window, surface) -> Board:
+        return Board(window, surface, code=self.get_code(scenario_id))
@@ -0,0 +1,149 @@
+import torch
+from planner import Layout, Plan
+
+# The 8 symmetries of the square grid: rotate a quarter turn clockwise `turns` times,
+# then mirror left to right if `flip`
+SYMMETRIES = [(turns, flip) for flip in (False, True) for turns in range(4)]
+
+CLOCKWISE = {"N": "E", "E": "S", "S": "W", "W": "N"}
+MIRRORED = {"N": "N", "E": "W", "S": "S", "W": "E"}
+
+# Env actions under a mirror image: increasing and decreasing the angle swap
+MIRRORED_ACTIONS = [0, 1, 2, 3, 5, 4, 6]
+
+
+def inverse(symmetry):
+    turns, flip = symmetry
+
+    # Mirrored symmetries are reflections, which undo themselves
+    if flip:
+        return symmetry
+
+    return ((4 - turns) % 4, False)
+
+
+def transform_cell(row, col, symmetry, grid_size=4):
+    turns, flip = symmetry
+    for _ in range(turns):
+        row, col = col, grid_size - 1 - row
+
+    if flip:
+        col = grid_size - 1 - col
+
+    return row, col
+
+
+def transform_zone(zone, symmetry, grid_size=4):
+    row, col = transform_cell(*divmod(zone - 1, grid_size), symmetry, grid_size)
+
+    return row * grid_size + col + 1
+
+
+def transform_direction(direction, symmetry):
+    turns, flip = symmetry
+    for _ in range(turns):
+        direction = CLOCKWISE[direction]
+
+    if flip:
+        direction = MIRRORED[direction]
+
+    return direction
+
+
+def transform_angle(angle, symmetry):
+    # Angles are measured clockwise on screen, with 0 pointing east
+    turns, flip = symmetry
+    angle = angle + 90 * turns
+    if flip:
+        angle = 180 - angle
+
+    return angle % 360
+
+
+def transform_action(action, symmetry):
+    # Works on plain action numbers and on tensors of actions
+    if not symmetry[1]:
+        return action
+
+    if isinstance(action, torch.Tensor):
+        return torch.tensor(MIRRORED_ACTIONS, device=action.device)[action]
+
+    return MIRRORED_ACTIONS[action]
+
+
+def transform_image(image: torch.Tensor, symmetry) -> torch.Tensor:
+    """
+    Rotates and mirrors observation frames, indexed [..., channel, x, y]
+
+    The grid is centered in the window, so the frame is transformed about its center.
+    """
+
+    turns, flip = symmetry
+    image = torch.rot90(image, turns, dims=(-2, -1))
+    if flip:
+        image = torch.flip(image, dims=(-2,))
+
+    return image
+
+
+def transform_blockade(location, symmetry, grid_size=4):
+    # Board blockade keys, e.g. (5, "N")
+    zone, cardinality = location
+
+    return (
+        transform_zone(zone, symmetry, grid_size),
+        transform_direction(cardinality, symmetry),
+    )
+
+
+def transform_layout(layout: Layout, symmetry, grid_size=4) -> Layout:
+    def zone(z):
+        return transform_zone(z, symmetry, grid_size)
+
+    return Layout(
+        start_zone=zone(layout.start_zone),
+        start_edge=transform_direction(layout.start_edge, symmetry),
+        target_zone=zone(layout.target_zone),
+        blocked_edges=frozenset(
+            frozenset(zone(z) for z in edge) for edge in layout.blocked_edges
+        ),
+        bonus_zones=frozenset(zone(z) for z in layout.bonus_zones),
+    )
+
+
+def transform_plan(plan: Plan, symmetry, grid_size=4) -> Plan:
+    return plan._replace(
+        zones=[transform_zone(z, symmetry, grid_size) for z in plan.zones],
+        headings=[transform_direction(d, symmetry) for d in plan.headings],
+        bonus_zones=frozenset(
+            transform_zone(z, symmetry, grid_size) for z in plan.bonus_zones
+        ),
+    )
+
+
+def layout_key(layout: Layout) -> tuple:
+    # Hashable, orderable form of a layout
+    return (
+        layout.start_zone,
+        layout.start_edge,
+        layout.target_zone,
+        tuple(sorted(tuple(sorted(edge)) for edge in layout.blocked_edges)),
+        tuple(sorted(layout.bonus_zones)),
+    )
+
+
+def canonical_layout(layout: Layout, grid_size=4):
+    """
+    Finds the representative of a layout among its 8 rotations and reflections
+
+    param layout: Layout to canonicalize
+    param grid_size: number of zones along each side of the grid
+
+    return: the smallest layout key over all symmetries, and the symmetry that maps
+        the layout onto it
+    """
+
+    return min(
+        (layout_key(transform_layout(layout, symmetry, grid_size)), symmetry)
+        for symmetry in SYMMETRIES
+    )
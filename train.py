@@ -1,9 +1,17 @@
+import argparse
+import random
+import time
 import numpy as np
 import torch
-import torch.nn.functional as F
-import torch.optim as optim
+from actors import ActorPool
 from game_env import RobotTourEnv  # Import your custom Gym environment
-from agent import ConvAgent  # Import your CNN-based RL agent
+from agent import ConvAgent, MLPAgent  # Import your RL agents
+from augment import augment_batch
+from checkpoint import CheckpointWriter, get_rng_state, load_checkpoint, set_rng_state
+from learner import DQNLearner
+from observation import FEATURE_SIZE
+from replay import ReplayBuffer
+from rollout import PipelinedRollout
 
 
 # Function to save the trained model
@@ -12,6 +20,40 @@ def save_model(agent, filename="robot_agent.pth"):
     print(f"Model saved to {filename}")
 
 
+def set_threads(threads) -> None:
+    # Intra-op threads can change at any time, inter-op threads only before first use
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(max(threads // 2, 1))
+    except RuntimeError:
+        pass
+
+    return None
+
+
+def set_seed(seed) -> None:
+    # Seeds every global RNG that boards, weights and actions are drawn from
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+    return None
+
+
+def make_replay(observation, capacity, shared=False, seed=None) -> ReplayBuffer:
+    # Frames are stored as uint8, feature vectors as float32
+    if observation == "features":
+        return ReplayBuffer(
+            capacity,
+            image_shape=(FEATURE_SIZE,),
+            observation_dtype=np.float32,
+            seed=seed,
+            shared=shared,
+        )
+
+    return ReplayBuffer(capacity, image_shape=(3, 64, 64), seed=seed, shared=shared)
+
+
 def train(
     agent,
     target_agent,
@@ -19,76 +61,405 @@ def train(
     episodes,
     save_interval=100,
     update_target_every=10,
+    batch_size=64,
+    updates_per_step=1.0,
+    buffer_capacity=20000,
+    learning_starts=1000,
+    log_every=1000,
+    augment=False,
+    checkpoint_dir="checkpoints",
+    keep_last=3,
+    keep_best=2,
+    save_replay=False,
+    resume=None,
+    learner_options=None,
+    seed=None,
 ):
-    optimizer = optim.Adam(agent.parameters(), lr=0.001)
+    """
+    Trains the agent one episode at a time on a single env
+
+    Checkpoints are written in the background after every new best episode and every
+    save_interval episodes. They hold everything needed to carry on training: both
+    agents, the optimizer, the RNG states and the counters. Resuming from one whose
+    replay contents were saved (save_replay) continues exactly as if training had not
+    stopped.
+
+    param resume: checkpoint path to resume from, or "latest" for the most recent
+        one in checkpoint_dir
+    param learner_options: extra DQNLearner arguments, such as bf16 and compile
+    param seed: seed of the replay buffer's sampling, for reproducible fresh runs
+    """
+
+    if augment and environment.observation != "image":
+        raise ValueError("augment only supports image observations")
+
+    learner = DQNLearner(
+        agent, target_agent, lr=0.001, gamma=0.99, **(learner_options or {})
+    )
+    replay = make_replay(environment.observation, buffer_capacity, seed=seed)
+    writer = CheckpointWriter(
+        checkpoint_dir,
+        keep_last=keep_last,
+        keep_best=keep_best,
+        resume=resume is not None,
+    )
+    state_key = environment.state_key
     best_reward = float("-inf")
-    gamma = 0.99  # Discount factor for future rewards
 
-    for episode in range(episodes):
+    # Updates are owed at updates_per_step per env step, so fractional ratios work too
+    update_credit = 0.0
+    step = 0
+    loss = None
+    start_episode = 0
+
+    if resume == "latest":
+        resume = writer.get_latest()
+        if resume is None:
+            raise ValueError(f"No checkpoint to resume from in {checkpoint_dir}")
+
+    if resume is not None:
+        checkpoint = load_checkpoint(resume)
+        agent.load_state_dict(checkpoint["agent"])
+        target_agent.load_state_dict(checkpoint["target_agent"])
+        learner.optimizer.load_state_dict(checkpoint["optimizer"])
+        learner.updates = checkpoint["updates"]
+        if checkpoint["replay"] is not None:
+            replay.load_state_dict(checkpoint["replay"])
+
+        writer.discard_after(checkpoint["episode"])
+        start_episode = checkpoint["episode"] + 1
+        step = checkpoint["step"]
+        update_credit = checkpoint["update_credit"]
+        best_reward = checkpoint["best_reward"]
+        loss = checkpoint["loss"]
+        environment.steps = checkpoint["env_steps"]
+        set_rng_state(checkpoint["rng"])
+        print(f"Resumed from {resume} at episode {start_episode}")
+
+    for episode in range(start_episode, episodes):
         state = environment.reset()
-        state_img = state["board_image"]
+        state_img = state[state_key]
         state_time = torch.tensor(np.array([state["time"]]), dtype=torch.float32)
 
         done = False
         total_reward = 0
 
         while not done:
-            # Assuming you're evaluating one instance at a time
-            q_values = agent(
-                state_img.unsqueeze(0), state_time.unsqueeze(0)
-            )  # Add batch dimension
-            print("Q-values shape:", q_values.shape)  # Should be [1, 7]
-
-            # Select the action with the highest Q-value for this instance
-            action = torch.argmax(
-                q_values.squeeze()
-            ).item()  # Squeeze to remove batch dimension
-            print("Selected action:", action)
-
-            new_state, reward, done = environment.step(action)
-            new_state_img = new_state["board_image"]  # Make sure this is a tensor
+            # Select the action with the highest Q-value
+            with environment.profiler.phase("agent"), torch.no_grad():
+                q_values = agent(state_img.unsqueeze(0), state_time.unsqueeze(0))
+            action = torch.argmax(q_values.squeeze()).item()
+
+            new_state, reward, done, _ = environment.step(action)
+            new_state_img = new_state[state_key]
             new_state_time = torch.tensor(
                 np.array([new_state["time"]]), dtype=torch.float32
             )
 
-            # Compute target Q-value
-            with torch.no_grad():
-                target_q = reward + gamma * torch.max(
-                    target_agent(new_state_img, new_state_time)
-                ) * (1 - done)
-
-            # Compute current Q-value
-            current_q = agent(state_img, state_time)[0][action]
+            replay.add(
+                state_img,
+                state["time"],
+                action,
+                reward,
+                new_state_img,
+                new_state["time"],
+                done,
+            )
+            step += 1
 
-            # Compute loss
-            loss = F.mse_loss(current_q, target_q)
+            # Learn from minibatches of past transitions once enough are stored
+            if len(replay) >= max(batch_size, learning_starts):
+                update_credit += updates_per_step
+                while update_credit >= 1:
+                    with environment.profiler.phase("learn"):
+                        batch = replay.sample(batch_size)
+                        if augment:
+                            batch = augment_batch(batch)
+                        loss = learner.update(batch)
+                    update_credit -= 1
 
-            # Backpropagation
-            optimizer.zero_grad()
-            loss.backward()
-            optimizer.step()
+            if step % log_every == 0:
+                print(
+                    f"Step {step}: episode {episode}, "
+                    f"updates {learner.updates}, loss {loss}"
+                )
 
             total_reward += reward
+            state = new_state
             state_img = new_state_img
             state_time = new_state_time
 
         # Update target network
         if episode % update_target_every == 0:
-            target_agent.load_state_dict(agent.state_dict())
+            learner.sync_target()
 
-        # Saving the model conditionally or at intervals
-        if total_reward > best_reward:
+        # Checkpoint on a new best episode or at intervals
+        is_best = total_reward > best_reward
+        if is_best:
             best_reward = total_reward
-            save_model(agent, filename=f"robot_agent_episode_{episode}.pth")
 
-        if episode % save_interval == 0:
-            save_model(agent, filename=f"robot_agent_interval_{episode}.pth")
+        if is_best or episode % save_interval == 0:
+            path = writer.save(
+                {
+                    "agent": agent.state_dict(),
+                    "target_agent": target_agent.state_dict(),
+                    "optimizer": learner.optimizer.state_dict(),
+                    "updates": learner.updates,
+                    "replay": replay.state_dict() if save_replay else None,
+                    "episode": episode,
+                    "step": step,
+                    "update_credit": update_credit,
+                    "best_reward": best_reward,
+                    "loss": loss,
+                    "env_steps": environment.steps,
+                    "rng": get_rng_state(),
+                },
+                step=episode,
+                score=total_reward,
+            )
+            print(f"Saving checkpoint to {path}")
+
+    writer.close()
+    save_model(agent, filename="robot_agent_final.pth")
+
+
+def train_parallel(
+    agent,
+    target_agent,
+    num_actors,
+    total_updates,
+    save_interval=10000,
+    update_target_every=1000,
+    publish_every=100,
+    batch_size=64,
+    buffer_capacity=20000,
+    learning_starts=1000,
+    log_every=1000,
+    seed=None,
+    augment=False,
+    observation="image",
+    learner_options=None,
+):
+    """
+    Trains with num_actors rollout processes writing into a shared replay buffer
+
+    The learner in this process only samples minibatches and updates the agent,
+    publishing its weights to the actors every publish_every updates.
+    """
+
+    if augment and observation != "image":
+        raise ValueError("augment only supports image observations")
+
+    learner = DQNLearner(
+        agent, target_agent, lr=0.001, gamma=0.99, **(learner_options or {})
+    )
+    replay = make_replay(observation, buffer_capacity, shared=True, seed=seed)
+    pool = ActorPool(agent, replay, num_actors, seed=seed, observation=observation)
+
+    try:
+        while learner.updates < total_updates:
+            # Fail instead of waiting forever on actors that have died
+            pool.check()
+
+            # Wait for the actors to fill the buffer
+            if len(replay) < max(batch_size, learning_starts):
+                time.sleep(0.1)
+                continue
+
+            batch = replay.sample(batch_size)
+            if augment:
+                batch = augment_batch(batch)
+            loss = learner.update(batch)
+
+            if learner.updates % publish_every == 0:
+                pool.publish(agent)
+
+            if learner.updates % update_target_every == 0:
+                learner.sync_target()
+
+            if learner.updates % log_every == 0:
+                print(
+                    f"Update {learner.updates}: "
+                    f"env steps {pool.get_env_steps()}, loss {loss}"
+                )
+
+            if learner.updates % save_interval == 0:
+                save_model(agent, filename=f"robot_agent_update_{learner.updates}.pth")
+
+    finally:
+        pool.close()
+        replay.close()
+
+    save_model(agent, filename="robot_agent_final.pth")
+
+
+def train_pipelined(
+    agent,
+    target_agent,
+    num_envs,
+    total_steps,
+    num_groups=2,
+    save_interval=10000,
+    update_target_every=1000,
+    batch_size=64,
+    updates_per_step=1.0,
+    buffer_capacity=20000,
+    learning_starts=1000,
+    log_every=1000,
+    augment=False,
+    observation="image",
+    learner_options=None,
+    seed=None,
+):
+    """
+    Trains on num_envs envs stepped by a PipelinedRollout
+
+    The learning algorithm is the same as in train; only the rollout is pipelined,
+    so env stepping overlaps with action selection and learner updates.
+    """
+
+    if augment and observation != "image":
+        raise ValueError("augment only supports image observations")
+
+    learner = DQNLearner(
+        agent, target_agent, lr=0.001, gamma=0.99, **(learner_options or {})
+    )
+    replay = make_replay(observation, buffer_capacity, seed=seed)
+    environments = [
+        RobotTourEnv(headless=True, observation=observation) for _ in range(num_envs)
+    ]
+    rollout = PipelinedRollout(agent, environments, num_groups, replay=replay)
+    best_reward = float("-inf")
+
+    update_credit = 0.0
+    step = 0
+    loss = None
+
+    try:
+        while step < total_steps:
+            transitions = rollout.advance()
+
+            # Learn while the worker thread steps the next group
+            if len(replay) >= max(batch_size, learning_starts):
+                update_credit += updates_per_step * len(transitions)
+                while update_credit >= 1:
+                    batch = replay.sample(batch_size)
+                    if augment:
+                        batch = augment_batch(batch)
+                    loss = learner.update(batch)
+                    update_credit -= 1
+
+                    if learner.updates % update_target_every == 0:
+                        learner.sync_target()
+
+                    if learner.updates % save_interval == 0:
+                        save_model(
+                            agent, filename=f"robot_agent_update_{learner.updates}.pth"
+                        )
+
+            for total_reward in rollout.pop_finished():
+                if total_reward > best_reward:
+                    best_reward = total_reward
+                    save_model(agent, filename=f"robot_agent_step_{step}.pth")
+
+            # Log whenever a multiple of log_every env steps is crossed
+            previous_step = step
+            step += len(transitions)
+            if step // log_every > previous_step // log_every:
+                print(f"Step {step}: updates {learner.updates}, loss {loss}")
+
+    finally:
+        rollout.close()
 
     save_model(agent, filename="robot_agent_final.pth")
 
 
 if __name__ == "__main__":
-    env = RobotTourEnv()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--actors",
+        type=int,
+        default=0,
+        help="number of rollout processes, 0 to step the env in this process",
+    )
+    parser.add_argument(
+        "--pipelined-envs",
+        type=int,
+        default=0,
+        help="number of envs (at least 2) stepped by a pipelined rollout",
+    )
+    parser.add_argument("--episodes", type=int, default=1000)
+    parser.add_argument(
+        "--steps", type=int, default=1000000, help="env steps of a pipelined run"
+    )
+    parser.add_argument("--updates", type=int, default=100000)
+    parser.add_argument(
+        "--augment",
+        action="store_true",
+        help="train on randomly rotated and mirrored copies of each transition",
+    )
+    parser.add_argument(
+        "--observation",
+        choices=["image", "features"],
+        default="image",
+        help="train a ConvAgent on frames or an MLPAgent on state feature vectors",
+    )
+    parser.add_argument(
+        "--checkpoint-dir",
+        default="checkpoints",
+        help="directory of this run's checkpoints, which must be empty unless resuming",
+    )
+    parser.add_argument(
+        "--keep-last", type=int, default=3, help="most recent checkpoints kept"
+    )
+    parser.add_argument(
+        "--keep-best", type=int, default=2, help="highest-reward checkpoints kept"
+    )
+    parser.add_argument(
+        "--save-replay",
+        action="store_true",
+        help="include the replay buffer in checkpoints, for exact resumes",
+    )
+    parser.add_argument(
+        "--resume",
+        help='checkpoint to resume single-env training from, or "latest"',
+    )
+    parser.add_argument(
+        "--bf16",
+        action="store_true",
+        help="run learner forward passes under bfloat16 autocast, if the CPU supports it",
+    )
+    parser.add_argument(
+        "--channels-last",
+        action="store_true",
+        help="run a ConvAgent's convolutions on channels-last tensors",
+    )
+    parser.add_argument(
+        "--compile",
+        action="store_true",
+        help="compile the learner's loss with torch.compile, falling back to eager",
+    )
+    parser.add_argument("--threads", type=int, help="torch threads of this process")
+    parser.add_argument(
+        "--seed", type=int, help="seed of the boards, weights and replay sampling"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time each phase of the simulation and print a summary periodically",
+    )
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        set_seed(args.seed)
+
+    # Training runs without a display, so skip the window entirely
+    env = RobotTourEnv(
+        headless=True,
+        profile=args.profile,
+        summary_every=1000 if args.profile else None,
+        observation=args.observation,
+    )
     action_size = env.action_space.n
     print(action_size)
 
@@ -98,8 +469,56 @@ if __name__ == "__main__":
     time_size = 1  # Assuming 'time' is a single scalar
 
     # Initialize the main agent and the target agent
-    agent = ConvAgent(image_size, time_size, action_size)
-    target_agent = ConvAgent(image_size, time_size, action_size)
+    if args.observation == "features":
+        agent = MLPAgent(FEATURE_SIZE, time_size, action_size)
+        target_agent = MLPAgent(FEATURE_SIZE, time_size, action_size)
+    else:
+        agent = ConvAgent(image_size, time_size, action_size)
+        target_agent = ConvAgent(image_size, time_size, action_size)
+
+    # Opt-in CPU fast path, each part of which can be turned on on its own
+    if args.threads is not None:
+        set_threads(args.threads)
+    if args.channels_last and args.observation == "image":
+        agent.set_channels_last()
+        target_agent.set_channels_last()
+    learner_options = {"bf16": args.bf16, "compile": args.compile}
 
     # Make sure to pass both the agent and target_agent to the train function
-    train(agent, target_agent, env, episodes=1000)
+    if args.pipelined_envs > 0:
+        train_pipelined(
+            agent,
+            target_agent,
+            args.pipelined_envs,
+            total_steps=args.steps,
+            augment=args.augment,
+            observation=args.observation,
+            learner_options=learner_options,
+            seed=args.seed,
+        )
+    elif args.actors > 0:
+        train_parallel(
+            agent,
+            target_agent,
+            args.actors,
+            total_updates=args.updates,
+            augment=args.augment,
+            observation=args.observation,
+            learner_options=learner_options,
+            seed=args.seed,
+        )
+    else:
+        train(
+            agent,
+            target_agent,
+            env,
+            episodes=args.episodes,
+            augment=args.augment,
+            checkpoint_dir=args.checkpoint_dir,
+            keep_last=args.keep_last,
+            keep_best=args.keep_best,
+            save_replay=args.save_replay,
+            resume=args.resume,
+            learner_options=learner_options,
+            seed=args.seed,
+        )
@@ -0,0 +1,247 @@
+import argparse
+import json
+import random
+import time
+import numpy as np
+import torch
+from agent import ConvAgent
+from game_env import RobotTourEnv
+from learner import DQNLearner
+from replay import ReplayBuffer
+from train import set_threads
+
+# Learner settings compared against the eager float32 path
+CONFIGS = {
+    "eager": {},
+    "channels_last": {"channels_last": True},
+    "bf16": {"bf16": True},
+    "compile": {"compile": True},
+    "fast": {"channels_last": True, "bf16": True, "compile": True},
+}
+
+
+def record_replay(steps, seed=0, capacity=None) -> ReplayBuffer:
+    """
+    Fills a replay buffer from random-action runs, shared by every configuration
+
+    param steps: number of transitions
+    param seed: seed for the boards, the actions and the buffer's sampling
+
+    return: ReplayBuffer holding the transitions
+    """
+
+    rng = random.Random(seed)
+    replay = ReplayBuffer(capacity or steps, image_shape=(3, 64, 64), seed=seed)
+    environment = RobotTourEnv(headless=True)
+    state = environment.reset(seed=seed)
+
+    for _ in range(steps):
+        action = rng.randrange(7)
+        new_state, reward, done, _ = environment.step(action)
+        replay.add(
+            state["board_image"],
+            state["time"],
+            action,
+            reward,
+            new_state["board_image"],
+            new_state["time"],
+            done,
+        )
+
+        state = new_state
+        if done:
+            state = environment.reset(seed=rng.getrandbits(32))
+
+    return replay
+
+
+def make_agents(config, seed=0) -> tuple:
+    # Every configuration starts from the same weights
+    torch.manual_seed(seed)
+    agent = ConvAgent((3, 64, 64), 1, 7)
+    target_agent = ConvAgent((3, 64, 64), 1, 7)
+    target_agent.load_state_dict(agent.state_dict())
+
+    if config.get("channels_last"):
+        agent.set_channels_last()
+        target_agent.set_channels_last()
+
+    return agent, target_agent
+
+
+def bench_learner(config, replay, updates, batch_size=64, seed=0, warmup=10) -> tuple:
+    """
+    Trains a fresh agent on the recorded transitions and times its updates
+
+    Minibatches are sampled in the same order for every configuration, so they differ
+    only in numerics and speed.
+
+    param config: entry of CONFIGS
+    param replay: ReplayBuffer from record_replay
+    param updates: number of timed updates, after warmup untimed ones
+    param batch_size: transitions per update
+    param seed: seed of the initial weights and the minibatch order
+
+    return: trained agent and stats of the run
+    """
+
+    agent, target_agent = make_agents(config, seed)
+    learner = DQNLearner(
+        agent,
+        target_agent,
+        bf16=config.get("bf16", False),
+        compile=config.get("compile", False),
+    )
+    replay.rng = np.random.default_rng(seed)
+    batches = [replay.sample(batch_size) for _ in range(warmup + updates)]
+
+    # Warmup includes compilation, which is not part of the steady-state throughput
+    start = time.perf_counter()
+    for batch in batches[:warmup]:
+        learner.update(batch)
+    warmup_seconds = time.perf_counter() - start
+
+    losses = []
+    start = time.perf_counter()
+    for i, batch in enumerate(batches[warmup:]):
+        losses.append(learner.update(batch))
+        if (i + 1) % 100 == 0:
+            learner.sync_target()
+    seconds = time.perf_counter() - start
+
+    return agent, {
+        "bf16": learner.bf16,
+        "compiled": learner.compiled_loss is not None,
+        "warmup_s": warmup_seconds,
+        "updates_per_s": updates / seconds,
+        "samples_per_s": updates * batch_size / seconds,
+        "final_loss": float(np.mean(losses[-max(updates // 10, 1) :])),
+    }
+
+
+def evaluate(agent, seeds, max_steps=2000) -> dict:
+    """
+    Runs the greedy policy on seeded boards
+
+    param agent: agent to evaluate
+    param seeds: board seeds, one run each
+    param max_steps: steps after which an unfinished run is ended
+
+    return: mean total reward and mean end-of-run Judge score (lower is better)
+    """
+
+    environment = RobotTourEnv(headless=True)
+    rewards = []
+    scores = []
+
+    for seed in seeds:
+        state = environment.reset(seed=seed)
+        total_reward = 0
+        done = False
+        steps = 0
+
+        while not done:
+            action = 6
+            if steps < max_steps:
+                with torch.no_grad():
+                    q_values = agent(
+                        state["board_image"].unsqueeze(0),
+                        torch.tensor([[float(state["time"])]]),
+                    )
+                action = q_values.argmax().item()
+
+            state, reward, done, _ = environment.step(action)
+            total_reward += reward
+            steps += 1
+
+        rewards.append(total_reward)
+        # The end-of-run score the game shows, time and distance included
+        scores.append(environment.game.judge.get_final_score())
+
+    return {
+        "mean_reward": float(np.mean(rewards)),
+        "mean_score": float(np.mean(scores)),
+    }
+
+
+def compare_decisions(agent, reference, replay, count=512, seed=1) -> float:
+    # Share of stored observations where both agents pick the same action
+    replay.rng = np.random.default_rng(seed)
+    batch = replay.sample(count)
+    with torch.no_grad():
+        actions = agent(batch["images"], batch["times"]).argmax(1)
+        reference_actions = reference(batch["images"], batch["times"]).argmax(1)
+
+    return float((actions == reference_actions).float().mean())
+
+
+def run(configs, updates, batch_size, replay_steps, eval_seeds, seed=0) -> dict:
+    replay = record_replay(replay_steps, seed=seed)
+    report = {
+        "meta": {
+            "torch": torch.__version__,
+            "torch_threads": torch.get_num_threads(),
+            "updates": updates,
+            "batch_size": batch_size,
+        },
+        "results": {},
+    }
+
+    reference = None
+    for name in configs:
+        agent, result = bench_learner(CONFIGS[name], replay, updates, batch_size, seed)
+        result.update(evaluate(agent, range(eval_seeds)))
+
+        # Decisions are compared against the eager float32 agent when it ran
+        if reference is not None:
+            result["agreement"] = compare_decisions(agent, reference, replay)
+        if name == "eager":
+            reference = agent
+
+        report["results"][name] = result
+        print(
+            f"{name:14s} {result['updates_per_s']:8.1f} updates/s  "
+            f"{result['samples_per_s']:9.0f} samples/s  "
+            f"warmup {result['warmup_s']:6.1f} s  loss {result['final_loss']:10.2f}  "
+            f"reward {result['mean_reward']:8.1f}  score {result['mean_score']:8.1f}"
+            + (
+                f"  agreement {result['agreement']:.1%}"
+                if "agreement" in result
+                else ""
+            )
+        )
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--configs", nargs="*", choices=list(CONFIGS), default=list(CONFIGS)
+    )
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--replay-steps", type=int, default=5000)
+    parser.add_argument(
+        "--eval-seeds", type=int, default=5, help="boards each trained agent runs on"
+    )
+    parser.add_argument("--threads", type=int, help="torch threads of this process")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file to write the JSON report to")
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        set_threads(args.threads)
+
+    report = run(
+        args.configs,
+        args.updates,
+        args.batch_size,
+        args.replay_steps,
+        args.eval_seeds,
+        seed=args.seed,
+    )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
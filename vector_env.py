@@ -0,0 +1,394 @@
+import random
+import numpy as np
+import pygame
+from gym import spaces
+from board import Board
+from clock import TIMESTEP
+from observation import (
+    BLOCKADE_FEATURES,
+    BLOCKADE_HIT_FEATURES,
+    BLOCKADE_INDICES,
+    BONUS_FEATURES,
+    BONUS_HIT_FEATURES,
+    FEATURE_SIZE,
+    MAX_TARGET_TIME,
+)
+
+# Most blockades a single board can hold (see Board.set_blockades)
+MAX_BLOCKADES = 8
+
+
+def slab_intervals(start, delta, low, high):
+    # Vectorized board.slab_interval
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_low = (low - start) / delta
+        t_high = (high - start) / delta
+
+    inside = (low < start) & (start < high)
+    still = delta == 0
+    enter = np.where(
+        still, np.where(inside, -np.inf, np.inf), np.minimum(t_low, t_high)
+    )
+    exit = np.where(still, np.where(inside, np.inf, -np.inf), np.maximum(t_low, t_high))
+
+    return enter, exit
+
+
+def slab_exits(start, delta, low, high):
+    # Vectorized board.slab_exit
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_exit = np.where(delta > 0, high - start, low - start) / delta
+
+    return np.where(delta == 0, np.inf, np.maximum(t_exit, 0))
+
+
+class VectorRobotTourEnv:
+    """
+    Steps N Robot Tour boards in lockstep with NumPy
+
+    Robot pose, speed, angle, blockade hit flags and bonus flags for every board are
+    stored in arrays, and each call to step applies the RobotTourEnv action semantics
+    (actions 0-6) to all boards at once. Time advances a fixed timestep per step
+    instead of reading the pygame clock, and finished boards are reset automatically.
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        timestep=TIMESTEP,
+        robot_size=30,
+        dowel_length=20,
+        window_size=(1000, 1000),
+        seed=None,
+    ) -> None:
+        self.num_envs = num_envs
+        self.rng = random.Random(seed) if seed is not None else random
+        self.timestep = timestep
+        self.robot_size = robot_size
+        self.dowel_length = dowel_length
+        self.window_size = window_size
+        self.action_space = spaces.Discrete(7)
+        self.observation_space = spaces.Box(
+            low=-np.inf, high=np.inf, shape=(FEATURE_SIZE,), dtype=np.float32
+        )
+
+        # Boards are only used to generate layouts, so they share one offscreen surface
+        self.surface = pygame.Surface(window_size)
+        board = Board(None, self.surface)
+        self.grid_start_x, self.grid_start_y = board.get_grid_start()
+        self.cell_size = board.get_cell_size()
+        self.grid_size = board.get_grid_size()
+        self.blockade_size = board.get_blockade_size()
+        self.grid_end_x = self.grid_start_x + self.cell_size * self.grid_size
+        self.grid_end_y = self.grid_start_y + self.cell_size * self.grid_size
+
+        n = self.num_envs
+        self.x = np.zeros(n)
+        self.y = np.zeros(n)
+        self.angle = np.zeros(n)
+        self.speed = np.ones(n)
+        self.entered_grid = np.zeros(n, dtype=bool)
+        self.score = np.zeros(n)
+        self.elapsed_time = np.zeros(n)
+        self.last_movement = np.zeros(n)
+        self.target_time = np.zeros(n)
+        self.target_x = np.zeros(n)
+        self.target_y = np.zeros(n)
+
+        # Blockade segments, padded to MAX_BLOCKADES and kept in Board order
+        self.blockade_x_start = np.zeros((n, MAX_BLOCKADES))
+        self.blockade_x_end = np.zeros((n, MAX_BLOCKADES))
+        self.blockade_y_start = np.zeros((n, MAX_BLOCKADES))
+        self.blockade_y_end = np.zeros((n, MAX_BLOCKADES))
+        self.blockade_valid = np.zeros((n, MAX_BLOCKADES), dtype=bool)
+        self.blockade_hit = np.zeros((n, MAX_BLOCKADES), dtype=bool)
+
+        # Position of each blockade in the feature masks (see FeatureEncoder)
+        self.blockade_index = np.zeros((n, MAX_BLOCKADES), dtype=np.int64)
+
+        # Bonus zones indexed by zone number (index 0 is unused)
+        num_zones = self.grid_size * self.grid_size + 1
+        self.bonus_zones = np.zeros((n, num_zones), dtype=bool)
+        self.bonus_hit = np.zeros((n, num_zones), dtype=bool)
+
+        return None
+
+    def load_board(self, index: int, board: Board, target_time=None) -> None:
+        """
+        Copies a Board layout into one slot of the batch and resets its robot
+
+        param index: slot to overwrite
+        param board: Board to copy the starting point, target, blockades and bonus zones from
+        param target_time: target time in milliseconds, random between 50 and 75 seconds if None
+        """
+
+        if target_time is None:
+            target_time = self.rng.randint(50, 75) * 1000
+
+        self.x[index], self.y[index] = board.get_starting_point()
+        self.angle[index] = board.get_starting_angle()
+        self.speed[index] = 1
+        self.entered_grid[index] = False
+        self.score[index] = 100
+        self.elapsed_time[index] = 0
+        self.last_movement[index] = 0
+        self.target_time[index] = target_time
+        self.target_x[index], self.target_y[index] = board.get_target_point()
+
+        self.blockade_valid[index] = False
+        self.blockade_hit[index] = False
+        for i, (location, hit) in enumerate(board.get_blockades().items()):
+            start_point, end_point = board.get_blockade_segment(location)
+            x_start, x_end = sorted((start_point[0], end_point[0]))
+            y_start, y_end = sorted((start_point[1], end_point[1]))
+
+            self.blockade_x_start[index, i] = x_start
+            self.blockade_x_end[index, i] = x_end
+            self.blockade_y_start[index, i] = y_start
+            self.blockade_y_end[index, i] = y_end
+            self.blockade_valid[index, i] = True
+            self.blockade_hit[index, i] = hit
+            self.blockade_index[index, i] = BLOCKADE_INDICES[location]
+
+        self.bonus_zones[index] = False
+        self.bonus_hit[index] = False
+        for zone, hit in board.get_bonus_zones().items():
+            self.bonus_zones[index, zone] = True
+            self.bonus_hit[index, zone] = hit
+
+        return None
+
+    def reset_envs(self, indices) -> None:
+        for index in indices:
+            board = Board(None, self.surface, seed=self.rng.getrandbits(64))
+            self.load_board(index, board)
+
+        # Match RobotTourEnv.reset, which renders once before the first observation
+        self.update(np.asarray(indices, dtype=np.int64))
+
+        return None
+
+    def reset(self) -> dict:
+        self.reset_envs(range(self.num_envs))
+
+        return self.get_state()
+
+    def get_state(self) -> dict:
+        """
+        Feature observations of every board, laid out as by FeatureEncoder
+
+        return: dict with "features" of shape (N, FEATURE_SIZE) and "time" of shape (N,)
+        """
+
+        time_to_target = self.elapsed_time - self.target_time
+        radians = np.radians(self.angle)
+        front_x = self.x + self.robot_size / 2
+        front_y = self.y + self.robot_size / 2
+        dowel_x = front_x + self.dowel_length * np.cos(radians)
+        dowel_y = front_y + self.dowel_length * np.sin(radians)
+        grid_width = self.cell_size * self.grid_size
+
+        features = np.zeros((self.num_envs, FEATURE_SIZE), dtype=np.float32)
+        features[:, 0] = front_x / self.window_size[0] * 2 - 1
+        features[:, 1] = front_y / self.window_size[1] * 2 - 1
+        features[:, 2] = np.cos(radians)
+        features[:, 3] = np.sin(radians)
+        features[:, 4] = self.speed / 10
+        features[:, 5] = (self.target_x - dowel_x) / grid_width
+        features[:, 6] = (self.target_y - dowel_y) / grid_width
+        features[:, 7] = -time_to_target / 1000 / MAX_TARGET_TIME
+        features[:, 8] = self.entered_grid
+
+        rows, slots = np.nonzero(self.blockade_valid)
+        columns = self.blockade_index[rows, slots]
+        features[rows, BLOCKADE_FEATURES + columns] = 1
+        features[rows, BLOCKADE_HIT_FEATURES + columns] = self.blockade_hit[rows, slots]
+
+        num_zones = self.grid_size * self.grid_size
+        features[:, BONUS_FEATURES : BONUS_FEATURES + num_zones] = self.bonus_zones[
+            :, 1:
+        ]
+        features[:, BONUS_HIT_FEATURES : BONUS_HIT_FEATURES + num_zones] = (
+            self.bonus_hit[:, 1:]
+        )
+
+        return {"features": features, "time": time_to_target}
+
+    def get_swept_collision(self, indices, dx, dy):
+        """
+        Vectorized Board.get_swept_collision for a subset of boards
+
+        param indices: boards being moved
+        param dx: movement of each robot along x
+        param dy: movement of each robot along y
+
+        return: whether each robot hit a blockade, the first blockade hit, the fraction
+            of the move made before the first contact and whether the robot is on the
+            grid after the move
+        """
+
+        robot_size = self.robot_size
+        blockade_size = self.blockade_size
+        x = self.x[indices]
+        y = self.y[indices]
+
+        # Test every blockade at once, then keep the first contact in Board order
+        x_enter, x_exit = slab_intervals(
+            x[:, None],
+            dx[:, None],
+            self.blockade_x_start[indices] - robot_size - blockade_size,
+            self.blockade_x_end[indices] + blockade_size,
+        )
+        y_enter, y_exit = slab_intervals(
+            y[:, None],
+            dy[:, None],
+            self.blockade_y_start[indices] - robot_size - blockade_size,
+            self.blockade_y_end[indices] + blockade_size,
+        )
+        enter = np.maximum(x_enter, y_enter)
+        exit = np.minimum(x_exit, y_exit)
+        overlapping = (enter < exit) & (exit > 0) & self.blockade_valid[indices]
+
+        # Robots already touching a blockade are only stopped if they do not get clear
+        touching = overlapping & (enter < 0)
+        enter = np.where(touching, 0, enter)
+        stopped = overlapping & ~(touching & (exit <= 1)) & (enter < 1)
+        contact_times = np.where(stopped, enter, np.inf)
+        first = contact_times.argmin(axis=1)
+        blocked = stopped.any(axis=1)
+        contact = np.where(blocked, contact_times[np.arange(len(indices)), first], 1)
+
+        # Robots enter the grid once strictly inside it before any contact
+        low_x = self.grid_start_x
+        low_y = self.grid_start_y
+        high_x = self.grid_end_x - robot_size
+        high_y = self.grid_end_y - robot_size
+        x_enter, x_exit = slab_intervals(x, dx, low_x, high_x)
+        y_enter, y_exit = slab_intervals(y, dy, low_y, high_y)
+        enter = np.maximum(x_enter, y_enter)
+        exit = np.minimum(x_exit, y_exit)
+        entered_grid = self.entered_grid[indices] | (
+            (enter < exit) & (enter < contact) & (exit > 0)
+        )
+
+        # Robots on the grid stop where they would leave it
+        border = np.minimum(
+            slab_exits(x, dx, low_x, high_x), slab_exits(y, dy, low_y, high_y)
+        )
+        at_border = entered_grid & (border < contact)
+        contact = np.where(at_border, border, contact)
+        blocked &= ~at_border
+
+        return blocked, first, contact, entered_grid
+
+    def move(self, indices, direction) -> None:
+        radians = np.radians(self.angle[indices])
+        distance = direction * self.speed[indices]
+        dx = distance * np.cos(radians)
+        dy = distance * np.sin(radians)
+
+        blocked, first, contact, entered_grid = self.get_swept_collision(
+            indices, dx, dy
+        )
+        self.entered_grid[indices] = entered_grid
+
+        # Move up to the contact point
+        moved = contact > 0
+        self.x[indices[moved]] += contact[moved] * dx[moved]
+        self.y[indices[moved]] += contact[moved] * dy[moved]
+        self.last_movement[indices[moved]] = self.elapsed_time[indices[moved]]
+
+        # Only the first hit on a blockade is penalized
+        penalty = blocked & ~self.blockade_hit[indices, first]
+        self.blockade_hit[indices[penalty], first[penalty]] = True
+        self.score[indices[penalty]] += 50
+
+        return None
+
+    def check_bonus_zones(self, indices) -> None:
+        # Mirrors Judge.check_bonus_zones, including its scoring, on the robot's center
+        center_x = self.x[indices] + self.robot_size / 2
+        center_y = self.y[indices] + self.robot_size / 2
+        col = (center_x - self.grid_start_x) // self.cell_size
+        row = (center_y - self.grid_start_y) // self.cell_size
+        zone = (col + row * self.grid_size + 1).astype(np.int64)
+
+        valid = (zone >= 1) & (zone <= self.grid_size * self.grid_size)
+        indices = indices[valid]
+        zone = zone[valid]
+
+        entered = self.bonus_zones[indices, zone] & ~self.bonus_hit[indices, zone]
+        self.score[indices[entered]] += 15
+        self.bonus_hit[indices[entered], zone[entered]] = True
+
+        return None
+
+    def is_timed_out(self, indices) -> np.ndarray:
+        elapsed_time = self.elapsed_time[indices]
+
+        # The robot must enter the grid within 10 seconds
+        late = ~self.entered_grid[indices] & ((elapsed_time // 1000) > 10)
+
+        # The robot must move forward or backward at least every three seconds
+        stalled = ((elapsed_time - self.last_movement[indices]) // 1000) > 3
+
+        return late | stalled
+
+    def update(self, indices) -> np.ndarray:
+        # Equivalent of a headless Game.render for a subset of boards
+        self.check_bonus_zones(indices)
+        timed_out = self.is_timed_out(indices)
+        self.elapsed_time[indices] += self.timestep
+
+        return timed_out
+
+    def get_final_score(self, indices) -> np.ndarray:
+        elapsed_time = self.elapsed_time[indices]
+        target_time = self.target_time[indices]
+        time_score = np.where(
+            target_time > elapsed_time,
+            ((target_time - elapsed_time) / 1000) * 2,
+            (elapsed_time - target_time) / 1000,
+        )
+
+        radians = np.radians(self.angle[indices])
+        dowel_x = (
+            self.x[indices] + self.robot_size / 2 + self.dowel_length * np.cos(radians)
+        )
+        dowel_y = (
+            self.y[indices] + self.robot_size / 2 + self.dowel_length * np.sin(radians)
+        )
+        distance_score = np.hypot(
+            dowel_x - self.target_x[indices], dowel_y - self.target_y[indices]
+        )
+
+        return self.score[indices] + time_score + distance_score
+
+    def step(self, actions) -> (dict, np.ndarray, np.ndarray):
+        actions = np.asarray(actions)
+        previous_score = self.score.copy()
+        rewards = np.zeros(self.num_envs)
+        dones = np.zeros(self.num_envs, dtype=bool)
+
+        # Ending the run is rewarded with the final score, including time and distance
+        ended = np.flatnonzero(actions == 6)
+        rewards[ended] = previous_score[ended] - self.get_final_score(ended)
+        dones[ended] = True
+
+        self.move(np.flatnonzero(actions == 0), 1)
+        self.move(np.flatnonzero(actions == 1), -1)
+        self.speed[actions == 2] += 1
+        self.speed[actions == 3] -= 1
+        self.angle[actions == 4] += 1
+        self.angle[actions == 5] -= 1
+
+        running = np.flatnonzero(actions != 6)
+        timed_out = self.update(running)
+        rewards[running] = previous_score[running] - self.score[running]
+        dones[running[timed_out]] = True
+
+        finished = np.flatnonzero(dones)
+        if len(finished) > 0:
+            self.reset_envs(finished)
+
+        return self.get_state(), rewards, dones